@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the fcB2B client hot paths.
+
+Features:
+- Times signing (enc, canonical_query, sign_get, Signer.sign), XML rendering
+  (pretty_xml, colorize_xml, the single-parse parse_once) and parsing (catalog parsing, typed record
+  parsers) against the files in sample_responses/.
+- Also runs the rendering/parsing benchmarks on a generated InventoryInquiry
+  response with many AvailableItem rows (10k by default).
+- Reports ops/sec and peak traced memory per benchmark.
+- Saves results as a JSON baseline and compares later runs against it,
+  exiting non-zero when something got slower than the tolerance allows.
+
+No network access is needed.
+
+Usage:
+    python bench_fcb2b.py
+    python bench_fcb2b.py --save bench_baseline.json
+    python bench_fcb2b.py --compare bench_baseline.json --tolerance 0.15
+    python bench_fcb2b.py --filter sign --rows 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import fcb2b_client as client
+from fcb2b_mock_server import ResponseTemplate
+from fcb2b_parsers import iter_records, record_parser_for
+from fcb2b_render import parse_once
+
+# ====== CONFIGURATION ======
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_responses")
+STOCKCHECK_URL = "https://des.buckwold.com/danciko/bwl/dancik-b2b/fcb2b/StockCheck"
+
+DEFAULT_ROWS = 10000
+DEFAULT_MIN_TIME = 0.2     # seconds per timing round
+DEFAULT_ROUNDS = 3         # best round is reported
+DEFAULT_TOLERANCE = 0.10   # allowed ops/sec drop vs. baseline (10%)
+
+Benchmark = Tuple[str, Callable[[], object]]
+
+# ====== INPUT DATA ======
+
+def read_sample(service_name: str) -> bytes:
+    with open(os.path.join(SAMPLES_DIR, f"{service_name}_SampleResponse.xml"), "rb") as fh:
+        return fh.read()
+
+
+def generate_inventory_inquiry(rows: int) -> bytes:
+    """
+    Build an InventoryInquiry response with `rows` AvailableItem entries,
+    using the sample response as the template.
+    """
+    sample = read_sample("InventoryInquiry").decode("utf-8")
+    return ResponseTemplate(sample, "AvailableItem").render(rows=rows)
+
+
+# ====== BENCHMARKS ======
+
+def build_benchmarks(rows: int) -> List[Benchmark]:
+    params = client.make_request_params("CASIMP10")
+    signer = client.Signer(STOCKCHECK_URL, client.SECRET_KEY, {"apiKey": client.API_KEY})
+
+    samples = {name: read_sample(name) for name in ("InventoryInquiry", "RelatedItems", "StockCheck")}
+    catalog = read_sample("ServiceProfile").decode("utf-8")
+    large = generate_inventory_inquiry(rows)
+    large_text = large.decode("utf-8")
+    large_pretty = client.pretty_xml(large_text)
+
+    benches: List[Benchmark] = [
+        ("sign/enc", lambda: client.enc("2025-11-27T02:06:58Z")),
+        ("sign/canonical_query", lambda: client.canonical_query(params)),
+        ("sign/sign_get", lambda: client.sign_get(STOCKCHECK_URL, params, client.SECRET_KEY)),
+        ("sign/Signer.sign", lambda: signer.sign(params)),
+        ("parse/catalog", lambda: client.parse_service_profiles(catalog)),
+    ]
+    for name, body in samples.items():
+        text = body.decode("utf-8")
+        benches += [
+            (f"parse/{name}", lambda name=name, body=body: list(iter_records(name, body))),
+            (f"render/pretty_xml/{name}", lambda text=text: client.pretty_xml(text)),
+            (f"render/colorize_xml/{name}", lambda text=text: client.colorize_xml(text)),
+        ]
+    benches += [
+        (f"parse/InventoryInquiry_{rows}", lambda: list(iter_records("InventoryInquiry", large))),
+        (f"render/pretty_xml/InventoryInquiry_{rows}", lambda: client.pretty_xml(large_text)),
+        (f"render/colorize_xml/InventoryInquiry_{rows}", lambda: client.colorize_xml(large_pretty)),
+        (f"render/parse_once/InventoryInquiry_{rows}",
+         lambda: parse_once(large, record_parser_for("InventoryInquiry"), color=True)),
+    ]
+    return benches
+
+
+# ====== RUNNER ======
+
+def time_benchmark(fn: Callable[[], object], min_time: float, rounds: int) -> float:
+    """
+    Return the best ops/sec over `rounds` rounds of at least min_time each.
+    """
+    # Calibrate the loop count so one round takes roughly min_time.
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or number >= 1 << 24:
+            break
+        number *= 10
+    number = max(1, int(number * (min_time / max(elapsed, 1e-9))))
+
+    best = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        best = max(best, number / elapsed)
+    return best
+
+
+def peak_memory(fn: Callable[[], object]) -> int:
+    """
+    Peak bytes allocated (tracemalloc) during one call.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(benches: List[Benchmark], min_time: float, rounds: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in benches:
+        results[name] = {
+            "ops_per_sec": time_benchmark(fn, min_time, rounds),
+            "peak_bytes": peak_memory(fn),
+        }
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: Dict[str, float], baseline: Optional[Dict[str, float]] = None) -> None:
+    line = f"{name:<48} {result['ops_per_sec']:>14,.1f} ops/s {result['peak_bytes'] / 1024:>12,.1f} KiB"
+    if baseline:
+        change = result["ops_per_sec"] / baseline["ops_per_sec"] - 1
+        line += f"   {change:+7.1%} vs baseline"
+    print(line)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """
+    Return the names of benchmarks whose ops/sec fell more than tolerance
+    below the baseline.
+    """
+    print("\n--- Compared to baseline ---")
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        print_result(name, result, base)
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for fcb2b_client hot paths.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help=f"AvailableItem rows in the generated response (default: {DEFAULT_ROWS})")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME,
+                        help=f"Seconds per timing round (default: {DEFAULT_MIN_TIME})")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS,
+                        help=f"Timing rounds per benchmark (default: {DEFAULT_ROUNDS})")
+    parser.add_argument("--save", metavar="PATH", help="Write results to a JSON baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed slowdown vs. baseline before failing (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args(argv)
+
+    benches = [b for b in build_benchmarks(args.rows) if args.filter in b[0]]
+    results = run(benches, args.min_time, args.rounds)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({"python": sys.version.split()[0], "results": results}, fh, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for name in regressions:
+                print(f"  {name}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""
+Batch runner for fcB2B item services (StockCheck, InventoryInquiry, ...).
+
+Features:
+- Takes any iterable of SupplierItemSKU values (consumed lazily, so it can
+  be a generator over a very large file).
+- Builds fresh params for every SKU and signs them with the client's cached
+  Signer (same output as sign_get).
+- Runs the calls on a thread pool driven by asyncio, with at most
+  `concurrency` requests in flight at once.
+- An optional Deadline caps the whole batch: in-flight calls are cut off
+  when it passes and SKUs not yet started are skipped.
+- Optionally moves parsing to a ParsePool of worker processes: response
+  bodies are handed over in chunks, so parsing scales with cores instead
+  of competing with the network threads for the GIL.
+- Yields BatchResult objects as soon as each call completes, together with
+  per-request timing. For InventoryInquiry, RelatedItems and StockCheck the
+  result is the list of typed records from fcb2b_parsers.
+- run_batch() is the same engine for code without an event loop: a plain
+  generator over a thread pool, in input or completion order, with a
+  bounded number of submitted calls.
+
+Usage:
+    import asyncio
+    from fcb2b_batch import stream_batch
+
+    async def run(service, skus):
+        async for result in stream_batch(skus, service, concurrency=32):
+            print(result.sku, result.status, f"{result.elapsed:.3f}s")
+
+    asyncio.run(run(service, skus))
+
+    # CPU-heavy responses (large InventoryInquiry / RelatedItems):
+    with ParsePool(workers=4) as pool:
+        async for result in stream_batch(skus, service, parse_pool=pool):
+            ...
+
+    # Without asyncio; results in input order:
+    for result in run_batch(skus, service, concurrency=32):
+        print(result.sku, result.status)
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from fcb2b_client import (
+    FcB2BClient,
+    ServiceProfile,
+    get_default_client,
+    make_request_params,
+)
+from fcb2b_metrics import RequestTiming
+from fcb2b_resilience import Deadline
+from fcb2b_parsers import SERVICE_LAYOUTS, parse_records
+
+# ====== CONFIGURATION ======
+
+DEFAULT_CONCURRENCY = 16
+PARSE_CHUNK_SIZE = 16      # response bodies per hand-off to a parse worker
+
+# ====== DATA CLASSES ======
+
+@dataclass
+class BatchResult:
+    sku: str
+    status: Optional[int]   # HTTP status, None if the request never completed
+    result: Any             # parsed body (list of records), None on failure
+    error: Optional[str]
+    elapsed: float          # seconds spent signing + sending + downloading
+    parse_elapsed: float    # seconds spent parsing the body
+    timing: Optional[RequestTiming] = None  # phases of the (last) attempt
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200
+
+
+# ====== PARSING ======
+
+def parse_body(body: bytes) -> ET.Element:
+    """
+    Fallback parser for services without a record layout: the response XML
+    as an ElementTree root.
+    """
+    return ET.fromstring(body)
+
+
+def default_parser(service: ServiceProfile) -> Callable[[bytes], Any]:
+    """
+    Typed records for services fcb2b_parsers knows, parse_body otherwise.
+    """
+    if service.name in SERVICE_LAYOUTS:
+        return functools.partial(parse_records, service.name)
+    return parse_body
+
+
+def _parse_one(parse: Callable[[bytes], Any], body: bytes) -> Tuple[Any, Optional[str], float]:
+    """
+    (result, error, seconds) for one body.
+    """
+    start = time.perf_counter()
+    try:
+        return parse(body), None, time.perf_counter() - start
+    except Exception as e:
+        return None, f"Parse failed: {e}", time.perf_counter() - start
+
+
+def _parse_chunk(parse: Callable[[bytes], Any], bodies: List[bytes]) -> List[Tuple[Any, Optional[str], float]]:
+    # Runs in a ParsePool worker process.
+    return [_parse_one(parse, body) for body in bodies]
+
+
+class ParsePool:
+    """
+    Worker processes for the parse stage of stream_batch.
+
+    Bodies are sent chunk_size at a time, which keeps the pickling and
+    process round trips per response small; the parsed records come back
+    pickled, which costs the batch process far less than parsing.
+    At most max_chunks_in_flight chunks are queued; beyond that the batch
+    stops starting new requests until parsing catches up.
+
+    The parse function must be picklable (a module-level function or a
+    functools.partial of one, like default_parser() returns). Workers are
+    started with "spawn", since forking a process that has network threads
+    running is not safe.
+
+    If a worker dies (e.g. killed for running out of memory), the chunks
+    in the pool at that moment fail; the next submit() starts fresh
+    workers, so the batch carries on. restarts counts how often that
+    happened.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = PARSE_CHUNK_SIZE,
+        max_chunks_in_flight: Optional[int] = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_chunks_in_flight = max_chunks_in_flight or 2 * self.workers
+        self.restarts = 0
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, parse: Callable[[bytes], Any], bodies: List[bytes]) -> Future:
+        try:
+            return self._executor.submit(_parse_chunk, parse, bodies)
+        except BrokenProcessPool:
+            # A worker died and took the executor down with it; the chunks
+            # it had already fail through their futures.
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self.restarts += 1
+            return self._executor.submit(_parse_chunk, parse, bodies)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ====== BATCH ENGINE ======
+
+def _fetch_body(
+    client: FcB2BClient,
+    service: ServiceProfile,
+    sku: str,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[BatchResult, Optional[bytes]]:
+    """
+    Sign and call a single SKU. Returns the (not yet parsed) result and the
+    body, or no body if the call failed. Runs on a worker thread.
+    """
+    start = time.perf_counter()
+    try:
+        resp = client.request(service, make_request_params(sku), deadline=deadline)
+        body = resp.content
+    except Exception as e:
+        return BatchResult(sku, None, None, str(e), time.perf_counter() - start, 0.0), None
+    elapsed = time.perf_counter() - start
+
+    timing = getattr(resp, "timing", None)
+    if resp.status_code != 200:
+        return BatchResult(sku, resp.status_code, None, f"HTTP {resp.status_code}", elapsed, 0.0, timing), None
+    return BatchResult(sku, resp.status_code, None, None, elapsed, 0.0, timing), body
+
+
+def _record_parse(client: FcB2BClient, service: ServiceProfile, result: BatchResult) -> None:
+    if client.metrics is not None and result.error is None:
+        client.metrics.record_parse(service.name, result.parse_elapsed, result.timing)
+
+
+def _fetch_one(
+    client: FcB2BClient,
+    service: ServiceProfile,
+    sku: str,
+    parse: Callable[[bytes], Any],
+    deadline: Optional[Deadline] = None,
+) -> BatchResult:
+    """
+    Sign, call and parse a single SKU. Runs on a worker thread.
+    """
+    result, body = _fetch_body(client, service, sku, deadline)
+    if body is not None:
+        result.result, result.error, result.parse_elapsed = _parse_one(parse, body)
+        _record_parse(client, service, result)
+    return result
+
+
+async def stream_batch(
+    skus: Iterable[str],
+    service: ServiceProfile,
+    client: Optional[FcB2BClient] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parse: Optional[Callable[[bytes], Any]] = None,
+    deadline: Optional[Deadline] = None,
+    parse_pool: Optional[ParsePool] = None,
+) -> AsyncIterator[BatchResult]:
+    """
+    Call `service` once per SKU and yield results in completion order.
+
+    No more than `concurrency` requests are in flight, and SKUs are pulled
+    from the iterable only when a slot frees up, so memory stays bounded
+    regardless of input size. parse defaults to default_parser(service).
+
+    With a deadline, every call shares it (so a call started late gets
+    less time) and no new SKUs are started once it has passed; the batch
+    simply ends early, without results for the SKUs it never reached.
+
+    With a parse_pool, threads only fetch and the bodies are parsed in the
+    pool's worker processes; results still come out as they finish.
+    """
+    if not service.https_url:
+        raise ValueError(f"Service {service.name} does not specify an HTTPS URL.")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    client = client or get_default_client()
+    parse = parse or default_parser(service)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fcb2b-batch")
+    sku_iter = iter(skus)
+    pending = set()
+
+    if parse_pool is not None:
+        try:
+            async for result in _stream_with_pool(sku_iter, service, client, concurrency,
+                                                  parse, deadline, parse_pool, executor):
+                yield result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return
+
+    try:
+        while True:
+            while len(pending) < concurrency:
+                if deadline is not None and deadline.expired():
+                    break
+                sku = next(sku_iter, None)
+                if sku is None:
+                    break
+                pending.add(loop.run_in_executor(executor, _fetch_one, client, service, sku, parse, deadline))
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _stream_with_pool(
+    sku_iter: Iterable[str],
+    service: ServiceProfile,
+    client: FcB2BClient,
+    concurrency: int,
+    parse: Callable[[bytes], Any],
+    deadline: Optional[Deadline],
+    pool: ParsePool,
+    executor: ThreadPoolExecutor,
+) -> AsyncIterator[BatchResult]:
+    """
+    stream_batch with fetching on threads and parsing in pool processes.
+    """
+    loop = asyncio.get_running_loop()
+    fetching: Set[asyncio.Future] = set()
+    parsing: Dict[asyncio.Future, List[BatchResult]] = {}
+    ready: List[Tuple[BatchResult, bytes]] = []   # fetched, waiting for a chunk
+    exhausted = False
+
+    while True:
+        # No new requests while the parse stage is saturated.
+        while not exhausted and len(fetching) < concurrency and len(parsing) < pool.max_chunks_in_flight:
+            sku = None if deadline is not None and deadline.expired() else next(sku_iter, None)
+            if sku is None:
+                exhausted = True
+                break
+            fetching.add(loop.run_in_executor(executor, _fetch_body, client, service, sku, deadline))
+
+        # Hand off a full chunk, or whatever is ready once no fetch can add to it.
+        while ready and (len(ready) >= pool.chunk_size or not fetching):
+            chunk, ready = ready[:pool.chunk_size], ready[pool.chunk_size:]
+            fut = asyncio.wrap_future(pool.submit(parse, [body for _, body in chunk]))
+            parsing[fut] = [result for result, _ in chunk]
+
+        if not fetching and not parsing:
+            break
+
+        done, _ = await asyncio.wait(fetching | parsing.keys(), return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            if fut in fetching:
+                fetching.discard(fut)
+                result, body = fut.result()
+                if body is None:
+                    yield result
+                else:
+                    ready.append((result, body))
+                continue
+
+            results = parsing.pop(fut)
+            try:
+                parsed = fut.result()
+            except Exception as e:
+                # e.g. a worker process died: fail the chunk, keep the batch
+                # going (the pool starts new workers on the next submit)
+                parsed = [(None, f"Parse failed: {e}", 0.0)] * len(results)
+            for result, (value, error, parse_elapsed) in zip(results, parsed):
+                result.result, result.error, result.parse_elapsed = value, error, parse_elapsed
+                _record_parse(client, service, result)
+                yield result
+
+
+def run_batch(
+    skus: Iterable[str],
+    service: ServiceProfile,
+    client: Optional[FcB2BClient] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parse: Optional[Callable[[bytes], Any]] = None,
+    deadline: Optional[Deadline] = None,
+    ordered: bool = True,
+    max_pending: Optional[int] = None,
+) -> Iterator[BatchResult]:
+    """
+    Synchronous counterpart of stream_batch: call `service` once per SKU on
+    a thread pool and yield the results, without asyncio.
+
+    With ordered=True results come out in input order; otherwise in
+    completion order. At most max_pending calls (default: twice
+    `concurrency`) are submitted but not yet yielded, and SKUs are pulled
+    from the iterable only as results are handed out, so memory stays flat
+    however long the input is. In ordered mode one slow SKU holds back the
+    results behind it; the extra slots keep the pool busy meanwhile.
+
+    Calls go through client.request, so they share its pooled session,
+    retries, rate limits and caches. Closing the generator early cancels
+    the calls that have not started.
+    """
+    if not service.https_url:
+        raise ValueError(f"Service {service.name} does not specify an HTTPS URL.")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    max_pending = max_pending or 2 * concurrency
+    if max_pending < concurrency:
+        raise ValueError("max_pending must be at least concurrency")
+
+    client = client or get_default_client()
+    parse = parse or default_parser(service)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fcb2b-batch")
+    sku_iter = iter(skus)
+    queued: Deque[Future] = deque()   # ordered mode: submission order
+    pending: Set[Future] = set()      # unordered mode
+
+    def submit_next() -> bool:
+        if deadline is not None and deadline.expired():
+            return False
+        sku = next(sku_iter, None)
+        if sku is None:
+            return False
+        fut = executor.submit(_fetch_one, client, service, sku, parse, deadline)
+        if ordered:
+            queued.append(fut)
+        else:
+            pending.add(fut)
+        return True
+
+    try:
+        if ordered:
+            while True:
+                while len(queued) < max_pending and submit_next():
+                    pass
+                if not queued:
+                    break
+                yield queued.popleft().result()
+        else:
+            while True:
+                while len(pending) < max_pending and submit_next():
+                    pass
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,354 @@
+"""
+Caching for fcB2B calls.
+
+Features:
+- CatalogCache keeps the parsed /services catalog in memory and on disk, so
+  a process start costs a file read instead of an HTTPS round trip.
+  Expired entries are revalidated with a conditional GET (ETag /
+  Last-Modified) and the stale copy is used if the endpoint is slow or down.
+- ResponseCache keeps recent item service responses keyed by service name
+  and business params (GlobalIdentifier/TimeStamp/Signature are ignored),
+  with LRU eviction, per-service TTLs and hit/miss counters.
+- SingleFlight merges concurrent identical requests into one upstream call
+  and hands the result to every waiter.
+
+Usage:
+    from fcb2b_cache import CatalogCache, ResponseCache, SingleFlight
+
+    profiles = CatalogCache(ttl=3600).get(client)
+    client = FcB2BClient(
+        response_cache=ResponseCache(ttls={"StockCheck": 30}),
+        single_flight=SingleFlight(),
+    )
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from fcb2b_client import (
+    FcB2BClient,
+    ServiceProfile,
+    get_default_client,
+    parse_service_profiles,
+    request_key,
+)
+from fcb2b_resilience import Deadline, DeadlineExceeded
+
+# ====== CONFIGURATION ======
+
+CATALOG_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fcb2b", "services.json")
+CATALOG_TTL = 3600.0              # seconds a cached catalog is used without revalidating
+CATALOG_REVALIDATE_TIMEOUT = 3.0  # max seconds for revalidation, body included, when a stale copy exists
+
+RESPONSE_CACHE_SIZE = 10000       # max cached responses across all services
+RESPONSE_CACHE_TTLS = {           # seconds; services not listed are not cached
+    "StockCheck": 30.0,
+    "InventoryInquiry": 60.0,
+}
+
+# ====== SERVICE CATALOG CACHE ======
+
+@dataclass
+class CatalogEntry:
+    services_url: str
+    profiles: List[ServiceProfile]
+    fetched_at: float                # wall-clock time of the last successful (re)validation
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class CatalogCache:
+    """
+    TTL cache for the parsed /services catalog, persisted as JSON.
+
+    get() returns the in-memory or on-disk copy while it is younger than ttl.
+    After that it revalidates with If-None-Match / If-Modified-Since (a 304
+    just refreshes the timestamp). If revalidation fails or takes longer than
+    revalidate_timeout, the stale copy is returned instead of an error.
+
+    services_url defaults to the client's services_url; a cached copy is
+    only used for the URL it was fetched from.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = CATALOG_CACHE_PATH,
+        ttl: float = CATALOG_TTL,
+        revalidate_timeout: float = CATALOG_REVALIDATE_TIMEOUT,
+        services_url: Optional[str] = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.revalidate_timeout = revalidate_timeout
+        self.services_url = services_url
+        self._entry: Optional[CatalogEntry] = None
+        self._lock = threading.Lock()
+
+    def get(self, client: Optional[FcB2BClient] = None, force: bool = False) -> List[ServiceProfile]:
+        """
+        Return the service catalog, fetching or revalidating it if needed.
+        force=True skips the TTL check (but still falls back to a stale copy).
+        """
+        client = client or get_default_client()
+        url = self.services_url or client.services_url
+        with self._lock:
+            entry = self._entry
+            if entry is None or entry.services_url != url:
+                entry = self._load(url)
+            self._entry = entry
+            if entry and not force and time.time() - entry.fetched_at < self.ttl:
+                return entry.profiles
+
+            headers: Dict[str, str] = {}
+            if entry and entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry and entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            try:
+                if entry:
+                    # A deadline, not a read timeout: that only bounds each
+                    # recv, so a trickling response could take forever.
+                    resp = client.get_within(url, Deadline(self.revalidate_timeout), headers=headers)
+                else:
+                    resp = client.get(url, headers=headers, timeout=client.timeout)
+                if resp.status_code == 304 and entry:
+                    entry.fetched_at = time.time()
+                    self._save(entry)
+                    return entry.profiles
+                resp.raise_for_status()
+                profiles = parse_service_profiles(resp.text)
+            except (requests.RequestException, DeadlineExceeded, ValueError, SyntaxError):
+                # ET.ParseError is a SyntaxError subclass
+                if entry:
+                    return entry.profiles
+                raise
+
+            self._entry = CatalogEntry(
+                services_url=url,
+                profiles=profiles,
+                fetched_at=time.time(),
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+            )
+            self._save(self._entry)
+            return profiles
+
+    def invalidate(self) -> None:
+        """
+        Forget the cached catalog, in memory and on disk.
+        """
+        with self._lock:
+            self._entry = None
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _load(self, url: str) -> Optional[CatalogEntry]:
+        if not self.path:
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            if data.get("services_url") != url:
+                return None
+            return CatalogEntry(
+                services_url=url,
+                profiles=[ServiceProfile(**p) for p in data["profiles"]],
+                fetched_at=float(data["fetched_at"]),
+                etag=data.get("etag"),
+                last_modified=data.get("last_modified"),
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing or corrupt cache file: behave as if there is none.
+            return None
+
+    def _save(self, entry: CatalogEntry) -> None:
+        if not self.path:
+            return
+        data = {
+            "services_url": entry.services_url,
+            "fetched_at": entry.fetched_at,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "profiles": [asdict(p) for p in entry.profiles],
+        }
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename so a concurrent reader never sees half a file.
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(data, fh)
+            os.replace(tmp, self.path)
+        except OSError:
+            # The cache is an optimisation; an unwritable directory is not fatal.
+            pass
+
+
+# ====== RESPONSE CACHE ======
+
+RequestKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class ResponseCache:
+    """
+    LRU cache of successful responses with a TTL per service.
+
+    ttls maps service name -> seconds; services without an entry fall back
+    to default_ttl, and a TTL of 0 disables caching for that service.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 0.0,
+    ):
+        self.max_entries = max_entries
+        self.ttls = dict(RESPONSE_CACHE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[RequestKey, Tuple[float, requests.Response]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, service_name: str) -> float:
+        return self.ttls.get(service_name, self.default_ttl)
+
+    def get(self, service_name: str, params: Dict[str, str]) -> Optional[requests.Response]:
+        """
+        Return the cached response, or None on a miss or expired entry.
+        Services that are not cached (TTL 0) return None without counting
+        as a miss, so hit_ratio only covers cacheable lookups.
+        """
+        if self.ttl_for(service_name) <= 0 or self.max_entries <= 0:
+            return None
+        key = request_key(service_name, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, resp = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return resp
+
+    def put(self, service_name: str, params: Dict[str, str], resp: requests.Response) -> None:
+        ttl = self.ttl_for(service_name)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        key = request_key(service_name, params)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, resp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ====== REQUEST COALESCING ======
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one.
+
+    The first caller for a key runs fn; callers that arrive while it is
+    still running wait for it and get the same result (or exception).
+    Once it finishes the key is forgotten, so later calls run fn again.
+    """
+
+    def __init__(self):
+        self.calls = 0       # fn actually executed
+        self.coalesced = 0   # callers that piggybacked on an in-flight call
+        self._in_flight: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Any, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn, or wait for the in-flight call with the same key. A waiter
+        gives up with TimeoutError after timeout seconds; the call itself
+        carries on for the others.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._in_flight[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for a shared call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+
+_default_catalog: Optional[CatalogCache] = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_default_catalog() -> CatalogCache:
+    """
+    Return the process-wide catalog cache, creating it on first use.
+    """
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = CatalogCache()
+        return _default_catalog
@@ -0,0 +1,189 @@
+"""
+Checkpoint log for resumable batch runs.
+
+Features:
+- Records the outcome (HTTP status, error) of every (service, SKU) pair a
+  batch has finished, in a small SQLite file.
+- A restarted batch skips the SKUs that already succeeded and calls the
+  rest again, failures included, so a run that dies at 80% only redoes
+  the remaining 20% (plus whatever it had not yet committed).
+- Outcomes are buffered and committed in groups; the caller decides when,
+  so it can first make its own output durable. A crash then loses at most
+  the uncommitted group, which is simply redone.
+- Attempts per SKU are counted, so SKUs that keep failing stand out.
+
+Usage:
+    from fcb2b_checkpoint import CheckpointLog
+
+    with CheckpointLog("nightly.ckpt") as log:
+        skus = log.skip_completed(service.name, read_skus("skus.txt"))
+        async for r in stream_batch(skus, service):
+            ...  # write r somewhere
+            log.record(service.name, r.sku, r.status, r.error)
+            if log.pending >= CHECKPOINT_COMMIT_EVERY:
+                log.commit()
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# ====== CONFIGURATION ======
+
+CHECKPOINT_COMMIT_EVERY = 200   # outcomes per commit in batch runs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    service     TEXT NOT NULL,
+    sku         TEXT NOT NULL,
+    ok          INTEGER NOT NULL,    -- 1 once the SKU has succeeded
+    status      INTEGER,             -- HTTP status of the last attempt, NULL if none
+    error       TEXT,                -- error of the last attempt
+    attempts    INTEGER NOT NULL,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (service, sku)
+) WITHOUT ROWID;
+"""
+
+# ====== DATA CLASSES ======
+
+@dataclass
+class Outcome:
+    service: str
+    sku: str
+    ok: bool
+    status: Optional[int]
+    error: Optional[str]
+    attempts: int
+    updated_at: float
+
+
+# ====== CHECKPOINT LOG ======
+
+class CheckpointLog:
+    """
+    SQLite-backed record of finished (service, SKU) pairs.
+
+    record() only buffers; commit() writes the buffer in one transaction.
+    A SKU counts as completed once an attempt returned HTTP 200 without
+    error; a later failure does not undo that. Safe to share between
+    threads (one connection, serialized by a lock).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._pending: List[Tuple] = []
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    # --- writing ---
+
+    @property
+    def pending(self) -> int:
+        """
+        Outcomes recorded but not yet committed.
+        """
+        return len(self._pending)
+
+    def record(self, service: str, sku: str, status: Optional[int], error: Optional[str] = None) -> None:
+        ok = int(error is None and status == 200)
+        with self._lock:
+            self._pending.append((service, sku, ok, status, error, time.time()))
+
+    def commit(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            rows, self._pending = self._pending, []
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.executemany(
+                    "INSERT INTO outcomes (service, sku, ok, status, error, attempts, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (service, sku) DO UPDATE SET "
+                    "ok = max(ok, excluded.ok), status = excluded.status, error = excluded.error, "
+                    "attempts = attempts + 1, updated_at = excluded.updated_at",
+                    rows,
+                )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def clear(self, service: Optional[str] = None) -> None:
+        """
+        Forget all outcomes (for one service, or all of them).
+        """
+        with self._lock:
+            self._pending = [p for p in self._pending if service is not None and p[0] != service]
+            if service is None:
+                self._conn.execute("DELETE FROM outcomes")
+            else:
+                self._conn.execute("DELETE FROM outcomes WHERE service = ?", (service,))
+
+    # --- reading ---
+
+    def is_completed(self, service: str, sku: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ok FROM outcomes WHERE service = ? AND sku = ?", (service, sku)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def skip_completed(self, service: str, skus: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the SKUs of skus that have not yet succeeded for service.
+        """
+        for sku in skus:
+            if not self.is_completed(service, sku):
+                yield sku
+
+    def failures(self, service: str) -> Iterator[Outcome]:
+        """
+        SKUs whose attempts so far all failed, by SKU.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT service, sku, ok, status, error, attempts, updated_at FROM outcomes "
+                "WHERE service = ? AND ok = 0 ORDER BY sku",
+                (service,),
+            ).fetchall()
+        for service_name, sku, ok, status, error, attempts, updated_at in rows:
+            yield Outcome(service_name, sku, bool(ok), status, error, attempts, updated_at)
+
+    def counts(self, service: str) -> Tuple[int, int]:
+        """
+        (completed, failed) SKUs recorded for service.
+        """
+        with self._lock:
+            completed, failed = self._conn.execute(
+                "SELECT coalesce(sum(ok), 0), coalesce(sum(1 - ok), 0) FROM outcomes WHERE service = ?",
+                (service,),
+            ).fetchone()
+        return completed, failed
+
+    def close(self, commit: bool = True) -> None:
+        """
+        Close the log, committing pending outcomes unless commit=False
+        (e.g. when the results they stand for may not have been written).
+        """
+        if commit:
+            self.commit()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
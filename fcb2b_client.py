@@ -8,26 +8,41 @@ Features:
 - Lets the user pick a service to test.
 - Prompts for required parameters (currently SupplierItemSKU).
 - Signs the request using HMAC-SHA256 (same pattern as StockCheck.py).
-- Calls the service and prints the response.
+- Calls the service and prints the response, with a per-phase timing
+  breakdown (sign, DNS, connect, TLS, TTFB, download, parse).
+- Non-interactive subcommands for cron jobs and pipelines, which write
+  JSON Lines instead of colorized XML.
 
 Usage:
-    python fcb2b_tester.py
+    python fcb2b_client.py                                  # interactive
+    python fcb2b_client.py services
+    python fcb2b_client.py call StockCheck --sku CASIMP10
+    python fcb2b_client.py batch StockCheck --input skus.txt
+    python fcb2b_client.py query --dye-lot 102924IM10
 """
 
+import argparse
+import asyncio
 import base64
 import hashlib
 import hmac
+import json
 import sys
+import threading
+import time
 import uuid
 import urllib.parse
-import re
-from xml.dom import minidom
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 
 import requests
 import xml.etree.ElementTree as ET
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+from fcb2b_metrics import RequestTiming, TimedHTTPAdapter, format_timing, timing_scope
+from fcb2b_render import colorize_xml, parse_once, pretty_xml
+from fcb2b_resilience import Deadline, DeadlineExceeded
 
 # ====== CONFIGURATION ======
 
@@ -36,16 +51,25 @@ SERVICES_URL = "https://des.buckwold.com/danciko/bwl/dancik-b2b/services"
 API_KEY = "anonymous"
 SECRET_KEY = "yoursecretkey"
 
+# Timeouts in seconds (see FcB2BClient)
+CONNECT_TIMEOUT = 5.0    # TCP + TLS connect
+READ_TIMEOUT = 20.0      # longest wait for the next bytes from the server
+REQUEST_DEADLINE = None  # whole call incl. retries and body; None = unbounded
+BODY_CHUNK_SIZE = 64 * 1024
+
+# HTTP connection pooling (see FcB2BClient)
+POOL_SIZE = 4            # number of per-host pools kept alive
+POOL_MAX_PER_HOST = 16   # connections per host; callers block when exhausted
+POOL_IDLE_TIMEOUT = 60.0 # seconds before idle connections are dropped
+
+STORE_COMMIT_EVERY = 200 # batch results per snapshot-store transaction (batch --store)
+
+# Params that change on every request and so must not identify it
+VOLATILE_PARAMS = frozenset({"GlobalIdentifier", "TimeStamp", "Signature"})
+
 CORE_NS = "http://fcb2b.com/schemas/1.0/core"
 NS = {"core": CORE_NS}
 
-# ANSI colors
-CYAN = "\033[96m"
-YELLOW = "\033[93m"
-GREEN = "\033[92m"
-RESET = "\033[0m"
-
-TAG_OPEN = re.compile(r'(<[^>]+>)')
 
 # ====== DATA CLASSES ======
 
@@ -78,6 +102,7 @@ def canonical_query(params: Dict[str, str]) -> str:
 def sign_get(full_url: str, params: Dict[str, str], secret_key: str) -> (str, str):
     """
     Given a full https URL and a param dict, build the StringToSign and signed URL.
+    The signed URL keeps the scheme of full_url (https unless given otherwise).
 
     StringToSign format:
         GET\n
@@ -87,6 +112,7 @@ def sign_get(full_url: str, params: Dict[str, str], secret_key: str) -> (str, st
     """
     parsed = urllib.parse.urlparse(full_url)
 
+    scheme = parsed.scheme or "https"
     host = parsed.netloc
     path = parsed.path
 
@@ -102,53 +128,558 @@ def sign_get(full_url: str, params: Dict[str, str], secret_key: str) -> (str, st
     signature_b64 = base64.b64encode(digest).decode()
     signature_enc = enc(signature_b64)
 
-    signed_url = f"https://{host}{path}?{cq}&Signature={signature_enc}"
+    signed_url = f"{scheme}://{host}{path}?{cq}&Signature={signature_enc}"
     return string_to_sign, signed_url
 
 
+class Signer:
+    """
+    Reusable signer for one service URL and secret key.
+
+    Produces exactly the same StringToSign and signed URL as sign_get, but
+    does the per-URL work once: the host/path are parsed up front, the HMAC
+    is keyed once and copied per request, and static params (e.g. apiKey)
+    are percent-encoded once. Static params are included in every signed
+    request; a value passed in params for the same name takes precedence.
+    """
+
+    def __init__(self, full_url: str, secret_key: str, static_params: Optional[Dict[str, str]] = None):
+        parsed = urllib.parse.urlparse(full_url)
+        self.host = parsed.netloc
+        self.path = parsed.path
+
+        self._sts_prefix = f"GET\n{self.host}\n{self.path}\n"
+        self._url_prefix = f"{parsed.scheme or 'https'}://{self.host}{self.path}?"
+        self._mac = hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha256)
+        # name -> (value, "enc(name)=enc(value)")
+        self._static = {k: (v, f"{enc(k)}={enc(v)}") for k, v in (static_params or {}).items()}
+        self._names: Dict[str, str] = {}
+
+    def canonical_query(self, params: Dict[str, str]) -> str:
+        fragments: Dict[str, str] = {k: frag for k, (_, frag) in self._static.items()}
+        names = self._names
+        for k, v in params.items():
+            static = self._static.get(k)
+            if static is not None and static[0] == v:
+                continue
+            name = names.get(k)
+            if name is None:
+                name = names[k] = enc(k)
+            fragments[k] = f"{name}={enc(v)}"
+        return "&".join([fragments[k] for k in sorted(fragments)])
+
+    def sign(self, params: Dict[str, str]) -> Tuple[str, str]:
+        """
+        Return (string_to_sign, signed_url) for params.
+        """
+        cq = self.canonical_query(params)
+        string_to_sign = self._sts_prefix + cq
+
+        mac = self._mac.copy()
+        mac.update(string_to_sign.encode("utf-8"))
+        # Base64 only produces '+', '/' and '=' outside the RFC3986 safe set.
+        signature_enc = (
+            base64.b64encode(mac.digest()).decode()
+            .replace("+", "%2B").replace("/", "%2F").replace("=", "%3D")
+        )
+
+        return string_to_sign, f"{self._url_prefix}{cq}&Signature={signature_enc}"
+
+
+def refresh_volatile_params(params: Dict[str, str]) -> Dict[str, str]:
+    """
+    Return a copy of params with a new GlobalIdentifier and TimeStamp, as
+    needed to re-send a request.
+    """
+    fresh = make_request_params()
+    return {**params, "GlobalIdentifier": fresh["GlobalIdentifier"], "TimeStamp": fresh["TimeStamp"]}
+
+
+def request_key(service_name: str, params: Dict[str, str]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """
+    Identify a request by service and business params, leaving out the
+    per-request GlobalIdentifier, TimeStamp and Signature.
+    """
+    business = tuple(sorted((k, v) for k, v in params.items() if k not in VOLATILE_PARAMS))
+    return service_name, business
+
+
+# ====== HTTP CLIENT ======
+
+def _iter_arriving(resp: requests.Response, size: int) -> Iterator[bytes]:
+    """
+    Yield the body of a streamed response in pieces of at most size bytes
+    as they arrive; iter_content() waits until each piece is full, so a
+    slowly trickling body would give no chance to check a deadline.
+    Errors are raised as the requests exceptions iter_content() gives.
+    """
+    read1 = getattr(resp.raw, "read1", None)  # urllib3 >= 2.2
+    if read1 is None:
+        yield from resp.iter_content(size)
+        return
+    try:
+        while True:
+            chunk = read1(size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e) from e
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e) from e
+    except ReadTimeoutError as e:
+        raise requests.ConnectionError(e) from e
+
+
+class FcB2BClient:
+    """
+    Owns a shared keep-alive connection pool used for every fcB2B call.
+
+    Reusing one requests.Session means repeated calls to the same host skip
+    the TCP and TLS handshake.
+
+    pool_size    : number of per-host connection pools kept alive
+    max_per_host : connections per host; extra callers wait for a free one
+    idle_timeout : seconds without traffic after which pooled connections are
+                   dropped, so we never reuse a socket the server has closed
+    services_url : catalog endpoint (point it at fcb2b_mock_server for offline runs)
+    connect_timeout / read_timeout : passed to requests as (connect, read)
+    request_deadline : optional total seconds for each request() call,
+                   including retries and the body download
+    response_cache : optional fcb2b_cache.ResponseCache consulted by request()
+    single_flight  : optional fcb2b_cache.SingleFlight that merges identical
+                     in-flight requests
+    rate_limiter   : optional fcb2b_resilience.RateLimiter applied per call
+    concurrency    : optional fcb2b_resilience.AdaptiveConcurrency (AIMD)
+                     limiting calls in flight
+    retry_policy   : optional fcb2b_resilience.RetryPolicy; every retry is
+                     re-signed with a fresh GlobalIdentifier/TimeStamp
+    circuit_breakers : optional fcb2b_resilience.CircuitBreakerRegistry; calls
+                     to a service URL whose circuit is open fail fast
+    metrics        : optional fcb2b_metrics.Metrics that receives the phase
+                     timings (sign, DNS, connect, TLS, TTFB, download) of
+                     every request() attempt
+    """
+
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        max_per_host: int = POOL_MAX_PER_HOST,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        secret_key: str = SECRET_KEY,
+        api_key: str = API_KEY,
+        services_url: str = SERVICES_URL,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        request_deadline: Optional[float] = REQUEST_DEADLINE,
+        response_cache=None,
+        single_flight=None,
+        rate_limiter=None,
+        concurrency=None,
+        retry_policy=None,
+        circuit_breakers=None,
+        metrics=None,
+    ):
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.secret_key = secret_key
+        self.api_key = api_key
+        self.services_url = services_url
+        self.timeout = (connect_timeout, read_timeout)  # requests' (connect, read) form
+        self.request_deadline = request_deadline
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.retry_policy = retry_policy
+        self.circuit_breakers = circuit_breakers
+        self.metrics = metrics
+        self._signers: Dict[str, Signer] = {}
+
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+        self._mount_adapters()
+
+    def _mount_adapters(self) -> None:
+        # Times DNS/connect/TLS/TTFB when a RequestTiming is active, else stock.
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.max_per_host,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def resize_pool(self, max_per_host: int) -> None:
+        """
+        Allow max_per_host connections per host from now on. The current
+        pooled connections are closed; new ones are opened as needed.
+        """
+        with self._lock:
+            if max_per_host == self.max_per_host:
+                return
+            self.max_per_host = max_per_host
+            for adapter in self.session.adapters.values():
+                adapter.close()
+            self._mount_adapters()
+
+    def _acquire(self) -> None:
+        with self._lock:
+            idle = time.monotonic() - self._last_used
+            if self._in_flight == 0 and idle > self.idle_timeout:
+                # Nothing is using the pool; drop the stale sockets.
+                for adapter in self.session.adapters.values():
+                    adapter.close()
+                self._mount_adapters()
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._last_used = time.monotonic()
+
+    def get(self, url: str, timing: Optional[RequestTiming] = None, **kwargs) -> requests.Response:
+        """
+        GET a URL through the pooled session. With a timing, the network
+        phases are recorded in it and it is attached to the response as
+        resp.timing.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        self._acquire()
+        try:
+            if timing is None:
+                return self.session.get(url, **kwargs)
+            with timing_scope(timing):
+                resp = self.session.get(url, **kwargs)
+            if not kwargs.get("stream"):
+                timing.body_read()
+            resp.timing = timing
+            return resp
+        finally:
+            self._release()
+
+    def request(
+        self,
+        service: ServiceProfile,
+        params: Dict[str, str],
+        deadline: Optional[Deadline] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Sign params for the given service and GET it. apiKey is always the
+        client's api_key, whatever params carries. Extra keyword arguments
+        (e.g. stream=True) are passed on to requests.
+
+        deadline bounds the whole call: waiting for capacity, every attempt
+        and retry back-off, and the body download. It is combined with the
+        client's request_deadline; DeadlineExceeded is raised when it runs out.
+
+        With a response_cache, a fresh cached 200 for the same service and
+        business params is returned without a network call. With
+        single_flight, concurrent identical requests share one upstream
+        call. Cached and shared responses are handed to several callers and
+        must be treated as read-only. Streamed requests bypass both.
+        """
+        params = {**params, "apiKey": self.api_key}
+        if self.request_deadline is not None:
+            own = Deadline(self.request_deadline)
+            if deadline is None or own.expires_at < deadline.expires_at:
+                deadline = own
+
+        shareable = not kwargs.get("stream")
+        cache = self.response_cache if shareable else None
+        if cache is not None:
+            cached = cache.get(service.name, params)
+            if cached is not None:
+                return cached
+
+        def fetch() -> requests.Response:
+            resp = self._fetch(service, params, deadline, **kwargs)
+            if cache is not None and resp.status_code == 200:
+                cache.put(service.name, params, resp)
+            return resp
+
+        flight = self.single_flight if shareable else None
+        if flight is None:
+            return fetch()
+        try:
+            return flight.do(request_key(service.name, params), fetch,
+                             timeout=deadline.remaining() if deadline else None)
+        except DeadlineExceeded:
+            raise
+        except TimeoutError:
+            raise DeadlineExceeded(f"Deadline passed waiting for a shared {service.name} call")
+
+    def signer_for(self, url: str) -> Signer:
+        """
+        Return the cached Signer for a service URL.
+        """
+        signer = self._signers.get(url)
+        if signer is None:
+            signer = self._signers[url] = Signer(url, self.secret_key, {"apiKey": self.api_key})
+        return signer
+
+    def _fetch(
+        self,
+        service: ServiceProfile,
+        params: Dict[str, str],
+        deadline: Optional[Deadline],
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send the request, retrying per retry_policy. Each retry gets fresh
+        volatile params and therefore a new signature. No retry is started
+        if its back-off would run past the deadline.
+        """
+        policy = self.retry_policy
+        if policy is None:
+            return self._send(service, params, deadline, **kwargs)
+
+        policy.start()
+        attempt = 0
+        while True:
+            resp = error = None
+            try:
+                resp = self._send(service, params, deadline, **kwargs)
+            except Exception as e:
+                error = e
+
+            # Also no when the back-off would outlast the deadline; then
+            # this attempt is reported and no budget is spent.
+            wait = policy.delay(attempt, resp)
+            status = resp.status_code if resp is not None else None
+            if not policy.should_retry(attempt, status=status, error=error, wait=wait, deadline=deadline):
+                if error is not None:
+                    raise error
+                return resp
+            if resp is not None:
+                resp.close()
+            time.sleep(wait)
+            attempt += 1
+            params = refresh_volatile_params(params)
+
+    def _send(
+        self,
+        service: ServiceProfile,
+        params: Dict[str, str],
+        deadline: Optional[Deadline],
+        **kwargs,
+    ) -> requests.Response:
+        if deadline is not None:
+            deadline.check()
+        breaker = ticket = None
+        if self.circuit_breakers is not None:
+            breaker = self.circuit_breakers.get(service.https_url)
+            ticket = breaker.before_call()  # raises CircuitOpenError when open
+        timing = RequestTiming.for_request(service.name, params)
+        wait_start = time.perf_counter()
+        try:
+            self._wait_for_capacity(service, deadline)
+        except BaseException:
+            if breaker is not None:
+                breaker.cancel(ticket)
+            raise
+
+        start = time.perf_counter()
+        timing.wait = start - wait_start
+        status = None
+        try:
+            _, signed_url = self.signer_for(service.https_url).sign(params)
+            timing.sign = time.perf_counter() - start
+            if deadline is None:
+                resp = self.get(signed_url, timing, headers={"Accept": "application/xml"}, **kwargs)
+            else:
+                resp = self.get_within(signed_url, deadline, timing, **kwargs)
+            status = resp.status_code
+            return resp
+        except Exception as e:
+            timing.error = str(e)
+            raise
+        finally:
+            if self.concurrency is not None:
+                self.concurrency.release(time.perf_counter() - start, status)
+            if breaker is not None:
+                breaker.record(ticket, status)
+            timing.status = status
+            timing.total = time.perf_counter() - wait_start
+            if self.metrics is not None:
+                self.metrics.record(timing)
+
+    def _wait_for_capacity(self, service: ServiceProfile, deadline: Optional[Deadline]) -> None:
+        timeout = deadline.remaining() if deadline is not None else None
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(service.name, timeout):
+            raise DeadlineExceeded(f"Deadline passed waiting for the {service.name} rate limit")
+        timeout = deadline.remaining() if deadline is not None else None
+        if self.concurrency is not None and not self.concurrency.acquire(timeout):
+            raise DeadlineExceeded(f"Deadline passed waiting for a {service.name} concurrency slot")
+
+    def get_within(
+        self,
+        url: str,
+        deadline: Deadline,
+        timing: Optional[RequestTiming] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        GET with connect/read timeouts clamped to the deadline. Unless the
+        caller streams, the body is read in chunks and abandoned once the
+        deadline passes (a read timeout alone only bounds each recv).
+        Raises DeadlineExceeded when the deadline passes first.
+        """
+        caller_streams = kwargs.pop("stream", False)
+        headers = {"Accept": "application/xml", **(kwargs.pop("headers", None) or {})}
+        endpoint = url.split("?", 1)[0]
+        try:
+            resp = self.get(url, timing, headers=headers, stream=True,
+                            timeout=deadline.clamp(self.timeout), **kwargs)
+        except requests.Timeout as e:
+            if deadline.expired():
+                raise DeadlineExceeded(f"Deadline passed waiting for {endpoint}") from e
+            raise
+        if caller_streams:
+            return resp
+
+        chunks = []
+        try:
+            for chunk in _iter_arriving(resp, BODY_CHUNK_SIZE):
+                chunks.append(chunk)
+                if deadline.expired():
+                    raise DeadlineExceeded(f"Deadline passed while downloading {endpoint}")
+        except requests.RequestException as e:
+            resp.close()
+            if deadline.expired():
+                raise DeadlineExceeded(f"Deadline passed while downloading {endpoint}") from e
+            raise
+        except BaseException:
+            resp.close()
+            raise
+        if timing is not None:
+            timing.body_read()
+        # Same as what Response.content stores after a non-streamed read.
+        resp._content = b"".join(chunks)
+        resp._content_consumed = True
+        return resp
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "FcB2BClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_default_client: Optional[FcB2BClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> FcB2BClient:
+    """
+    Return the process-wide client, creating it on first use.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = FcB2BClient()
+        return _default_client
+
+
 # ====== SERVICE DISCOVERY ======
 
-def fetch_service_profiles() -> List[ServiceProfile]:
+def fetch_service_profiles(
+    client: Optional[FcB2BClient] = None,
+    echo: bool = True,
+) -> List[ServiceProfile]:
     """
     Call the /services endpoint and parse the XML into ServiceProfile objects.
+    With echo=True the raw catalog is also pretty-printed to the terminal.
     """
-    resp = requests.get(SERVICES_URL, timeout=20)
+    client = client or get_default_client()
+    resp = client.get(client.services_url)
     resp.raise_for_status()
 
-    xml_response = resp.text
-    print(colorize_xml(pretty_xml(xml_response)))
+    if not echo:
+        return parse_service_profiles(resp.text)
+    # One parse yields both the colored listing and the profiles.
+    rendered = parse_once(resp.content, ServiceProfileParser(), pretty=False, color=True)
+    print(rendered.colored)
+    return rendered.records
 
 
-    # The XML declares some elements in the core namespace.
-    root = ET.fromstring(xml_response)
+def load_service_profiles(client: Optional[FcB2BClient] = None, refresh: bool = False) -> List[ServiceProfile]:
+    """
+    Return the service catalog through the on-disk catalog cache
+    (see fcb2b_cache.CatalogCache). refresh=True forces revalidation.
+    """
+    from fcb2b_cache import get_default_catalog
+    return get_default_catalog().get(client, force=refresh)
 
-    profiles: List[ServiceProfile] = []
-    for sp in root.findall("ServiceProfile"):
-        name_el = sp.find("core:Name", NS)
-        desc_el = sp.find("core:Description", NS)
-        anon_el = sp.find("core:AnonymousAccessPermitted", NS)
-        version_el = sp.find("Version")
 
-        if name_el is None or desc_el is None or anon_el is None or version_el is None:
-            # Skip malformed entries
-            continue
+def parse_service_profiles(xml_response: str) -> List[ServiceProfile]:
+    """
+    Parse a /services catalog document into ServiceProfile objects.
+    """
+    parser = ET.XMLPullParser(("start", "end"))
+    parser.feed(xml_response)
+    parser.close()
+    catalog = ServiceProfileParser()
+    profiles = (catalog.feed(event, elem) for event, elem in parser.read_events())
+    return [sp for sp in profiles if sp is not None]
 
-        https_path = version_el.findtext("HTTPSRequestPath", default="").strip()
-        version_number = version_el.findtext("VersionNumber", default="").strip()
-        date = version_el.findtext("Date", default="").strip()
-
-        profiles.append(
-            ServiceProfile(
-                name=name_el.text.strip(),
-                description=desc_el.text.strip(),
-                anonymous_access=(anon_el.text.strip().lower() == "true"),
-                https_url=https_path,
-                version=version_number,
-                date=date,
-            )
-        )
 
-    return profiles
+class ServiceProfileParser:
+    """
+    Turns ("start", "end") parse events of a /services document into
+    ServiceProfile objects, one per top-level ServiceProfile element. Same
+    feed() interface as fcb2b_parsers.RecordParser, so it can share one
+    parse with the pretty-printer (fcb2b_render.parse_once).
+    """
+
+    def __init__(self):
+        self._stack: List[ET.Element] = []
+
+    def feed(self, event: str, elem: ET.Element) -> Optional[ServiceProfile]:
+        if event == "start":
+            self._stack.append(elem)
+            return None
+        self._stack.pop()
+        if len(self._stack) != 1 or elem.tag != "ServiceProfile":
+            return None
+        self._stack[0].remove(elem)
+        return profile_from_element(elem)
+
+
+def profile_from_element(sp: ET.Element) -> Optional[ServiceProfile]:
+    """
+    Build a ServiceProfile from one <ServiceProfile> element, or None if it
+    is missing required parts.
+    """
+    # The XML declares some elements in the core namespace.
+    name_el = sp.find("core:Name", NS)
+    desc_el = sp.find("core:Description", NS)
+    anon_el = sp.find("core:AnonymousAccessPermitted", NS)
+    version_el = sp.find("Version")
+
+    if name_el is None or desc_el is None or anon_el is None or version_el is None:
+        # Skip malformed entries
+        return None
+
+    https_path = version_el.findtext("HTTPSRequestPath", default="").strip()
+    version_number = version_el.findtext("VersionNumber", default="").strip()
+    date = version_el.findtext("Date", default="").strip()
+
+    return ServiceProfile(
+        name=name_el.text.strip(),
+        description=desc_el.text.strip(),
+        anonymous_access=(anon_el.text.strip().lower() == "true"),
+        https_url=https_path,
+        version=version_number,
+        date=date,
+    )
 
 
 def print_service_profiles(profiles: List[ServiceProfile]) -> None:
@@ -167,40 +698,6 @@ def print_service_profiles(profiles: List[ServiceProfile]) -> None:
 
 # ====== INTERACTIVE TESTING ======
 
-def colorize_xml(xml: str) -> str:
-    """
-    Very lightweight XML syntax highlighter.
-    Colors:
-        - tags        = cyan
-        - attributes  = yellow
-        - attr values = green
-    """
-    def colorize_tag(tag: str) -> str:
-        # <tag attr="value">
-        # break tag into < + content + >
-        content = tag[1:-1]
-
-        # Colorize attributes inside tag
-        def repl_attr(match):
-            attr = match.group(1)
-            val = match.group(2)
-            return f"{YELLOW}{attr}{RESET}={GREEN}\"{val}\"{RESET}"
-
-        content = re.sub(r'(\w+)\s*=\s*"([^"]*)"', repl_attr, content)
-
-        return f"{CYAN}<{content}>{RESET}"
-
-    # Replace tags with colorized versions
-    colored = TAG_OPEN.sub(lambda m: colorize_tag(m.group(1)), xml)
-    return colored
-
-def pretty_xml(raw_xml: str) -> str:
-    try:
-        dom = minidom.parseString(raw_xml.encode("utf-8"))
-        return dom.toprettyxml(indent="  ")
-    except Exception:
-        return raw_xml
-
 def choose_service(profiles: List[ServiceProfile]) -> Optional[ServiceProfile]:
     """
     Ask the user to pick a service by number.
@@ -220,6 +717,23 @@ def choose_service(profiles: List[ServiceProfile]) -> Optional[ServiceProfile]:
         print("Choice out of range. Try again.")
 
 
+def make_request_params(sku: Optional[str] = None, api_key: str = API_KEY) -> Dict[str, str]:
+    """
+    Build the common querystring parameters (fresh GlobalIdentifier and
+    TimeStamp, plus apiKey) without prompting. If sku is given it is added
+    as SupplierItemSKU. FcB2BClient.request() replaces apiKey with the
+    client's api_key.
+    """
+    params: Dict[str, str] = {
+        "GlobalIdentifier": str(uuid.uuid4()),
+        "TimeStamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),  # NOTE: capital 'S' as per your server
+        "apiKey": api_key,
+    }
+    if sku:
+        params["SupplierItemSKU"] = sku
+    return params
+
+
 def build_params_for_service(service: ServiceProfile) -> Dict[str, str]:
     """
     Build the querystring parameters for the chosen service.
@@ -232,20 +746,11 @@ def build_params_for_service(service: ServiceProfile) -> Dict[str, str]:
 
     You can expand this later with per-service logic (e.g. location, customer, etc.).
     """
-    # Common required fields
-    global_id = str(uuid.uuid4())
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    params = make_request_params()
 
     print(f"\nTesting service: {service.name}")
-    print(f"Generated GlobalIdentifier: {global_id}")
-    print(f"Generated TimeStamp       : {timestamp}")
-
-    # Basic params everyone gets
-    params: Dict[str, str] = {
-        "GlobalIdentifier": global_id,
-        "TimeStamp": timestamp,  # NOTE: capital 'S' as per your server
-        "apiKey": API_KEY,
-    }
+    print(f"Generated GlobalIdentifier: {params['GlobalIdentifier']}")
+    print(f"Generated TimeStamp       : {params['TimeStamp']}")
 
     # Service-specific input (you can expand this logic as needed)
     if service.name in ("InventoryInquiry", "RelatedItems", "StockCheck"):
@@ -262,15 +767,24 @@ def build_params_for_service(service: ServiceProfile) -> Dict[str, str]:
     return params
 
 
-def call_service(service: ServiceProfile, params: Dict[str, str]) -> None:
+def call_service(
+    service: ServiceProfile,
+    params: Dict[str, str],
+    client: Optional[FcB2BClient] = None,
+) -> None:
     """
     Sign and call the selected service, then print the response.
     """
+    client = client or get_default_client()
     if not service.https_url:
         print("This service does not specify an HTTPS URL. Cannot call it.")
         return
 
-    string_to_sign, signed_url = sign_get(service.https_url, params, SECRET_KEY)
+    params = {**params, "apiKey": client.api_key}
+    timing = RequestTiming.for_request(service.name, params)
+    start = time.perf_counter()
+    string_to_sign, signed_url = sign_get(service.https_url, params, client.secret_key)
+    timing.sign = time.perf_counter() - start
 
     print("\n--- Request Details ---")
     #print("StringToSign:")
@@ -279,27 +793,388 @@ def call_service(service: ServiceProfile, params: Dict[str, str]) -> None:
     print(signed_url)
 
     try:
-        resp = requests.get(signed_url, headers={"Accept": "application/xml"}, timeout=20)
+        start = time.perf_counter()
+        resp = client.get(signed_url, timing, headers={"Accept": "application/xml"})
+        timing.status = resp.status_code
+        timing.total = timing.sign + time.perf_counter() - start
+        if client.metrics is not None:
+            client.metrics.record(timing)
         print("\n--- Response ---")
         print(f"HTTP {resp.status_code}")
         if resp.status_code == 200:
             print("\n--- XML Response ---")
-            pretty = pretty_xml(resp.text)
-            print(colorize_xml(pretty))
+            start = time.perf_counter()
+            try:
+                rendered = parse_once(resp.content, pretty=False, color=True)
+            except ET.ParseError:
+                print(resp.text)
+            else:
+                timing.parse = time.perf_counter() - start
+                if client.metrics is not None:
+                    client.metrics.record_parse(service.name, timing.parse, timing)
+                print(rendered.colored)
         else:
             print("\n--- Raw Response ---")
             print(resp.text)
+        print("\n--- Timing ---")
+        print(format_timing(timing))
     except Exception as e:
         print("Request failed:", e)
 
 
+# ====== SCRIPTED (NON-INTERACTIVE) MODE ======
+
+def find_service(profiles: List[ServiceProfile], name: str) -> Optional[ServiceProfile]:
+    """
+    Look up a service by name (case-insensitive).
+    """
+    for sp in profiles:
+        if sp.name.lower() == name.lower():
+            return sp
+    return None
+
+
+def write_json_line(obj: dict, out: Optional[TextIO] = None) -> None:
+    # default=str renders the Decimal quantities on parsed records
+    (out or sys.stdout).write(json.dumps(obj, separators=(",", ":"), default=str) + "\n")
+
+
+def _resolve_service(client: FcB2BClient, name: str, refresh: bool = False) -> Optional[ServiceProfile]:
+    service = find_service(load_service_profiles(client, refresh), name)
+    if service is None:
+        print(f"Unknown service: {name}", file=sys.stderr)
+    elif not service.https_url:
+        print(f"Service {service.name} does not specify an HTTPS URL.", file=sys.stderr)
+        return None
+    return service
+
+
+def cmd_services(args: argparse.Namespace, client: FcB2BClient) -> int:
+    for sp in load_service_profiles(client, args.refresh_catalog):
+        write_json_line(asdict(sp))
+    return 0
+
+
+def cmd_call(args: argparse.Namespace, client: FcB2BClient) -> int:
+    service = _resolve_service(client, args.service, args.refresh_catalog)
+    if service is None:
+        return 2
+
+    from fcb2b_input import normalize_sku
+    failures = 0
+    for sku in args.sku:
+        sku = normalize_sku(sku)  # as batch does, so both send and cache the same SKU
+        start = time.perf_counter()
+        try:
+            resp = client.request(service, make_request_params(sku))
+        except Exception as e:
+            write_json_line({"service": service.name, "sku": sku, "status": None,
+                             "error": str(e), "elapsed": time.perf_counter() - start})
+            failures += 1
+            continue
+        line = {"service": service.name, "sku": sku, "status": resp.status_code,
+                "elapsed": time.perf_counter() - start}
+        if resp.status_code == 200 and not args.raw and _has_record_layout(service):
+            from fcb2b_parsers import parse_records
+            parse_start = time.perf_counter()
+            records = parse_records(service.name, resp.content)
+            if client.metrics is not None:
+                client.metrics.record_parse(service.name, time.perf_counter() - parse_start,
+                                            getattr(resp, "timing", None))
+            line["records"] = [r.as_dict() for r in records]
+        else:
+            line["body"] = resp.text
+        write_json_line(line)
+        if resp.status_code != 200:
+            failures += 1
+    return 1 if failures else 0
+
+
+def _has_record_layout(service: ServiceProfile) -> bool:
+    from fcb2b_parsers import SERVICE_LAYOUTS
+    return service.name in SERVICE_LAYOUTS
+
+
+def _body_text(body: bytes) -> str:
+    return body.decode("utf-8", errors="replace")
+
+
+async def _run_batch(args: argparse.Namespace, client: FcB2BClient, service: ServiceProfile) -> int:
+    from fcb2b_batch import ParsePool, stream_batch
+    from fcb2b_checkpoint import CHECKPOINT_COMMIT_EVERY
+
+    as_records = not args.raw and _has_record_layout(service)
+    parse = None if as_records else _body_text
+
+    from fcb2b_input import SkuReader, parse_shard
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    reader = SkuReader(args.input, fmt=args.input_format, field=args.sku_field,
+                       dedupe=not args.keep_duplicates, shard=shard)
+    skus: Iterable[str] = reader
+
+    checkpoint = None
+    resuming = False
+    if args.checkpoint:
+        if args.format == "parquet" and args.output != "-":
+            print("--checkpoint cannot resume Parquet output (it cannot be appended to); "
+                  "use --format jsonl or csv.", file=sys.stderr)
+            return 2
+        from fcb2b_checkpoint import CheckpointLog
+        checkpoint = CheckpointLog(args.checkpoint)
+        completed, failed = checkpoint.counts(service.name)
+        resuming = bool(completed or failed)
+        if resuming:
+            print(f"Resuming from {args.checkpoint}: skipping {completed} completed SKUs, "
+                  f"retrying {failed} failed.", file=sys.stderr)
+        skus = checkpoint.skip_completed(service.name, skus)
+
+    sink = None
+    if args.format:
+        if not as_records:
+            print(f"--format needs parsed records; {service.name} has no record layout "
+                  "(or --raw was given).", file=sys.stderr)
+            return 2
+        from fcb2b_sinks import open_sink
+        # A resumed run adds to the output of the interrupted one.
+        sink = open_sink(args.format, args.output, append=resuming)
+
+    store = None
+    if args.store:
+        if service.name != "InventoryInquiry" or not as_records:
+            print("--store only applies to parsed InventoryInquiry results.", file=sys.stderr)
+            return 2
+        from fcb2b_store import InventoryStore
+        store = InventoryStore(args.store)
+        if args.max_age:
+            skus = (sku for sku in skus if not store.is_fresh(sku, args.max_age))
+    elif args.changes:
+        print("--changes needs --store (the previous snapshots).", file=sys.stderr)
+        return 2
+    pending_snapshots: List[Tuple[str, list]] = []
+
+    def save_snapshots() -> None:
+        # Stage, write the changes out, then commit: if the run dies before
+        # the commit, the next run reports the same changes again.
+        changes = store.put_many(pending_snapshots, commit=False)
+        pending_snapshots.clear()
+        if args.changes:
+            for change in changes:
+                if sink is not None:
+                    sink.write(change.as_dict())
+                else:
+                    write_json_line(change.as_dict())
+            if sink is not None:
+                sink.flush()
+            sys.stdout.flush()
+        store.commit()
+
+    # With a sink or --changes, stdout/the sink carry data only and failed
+    # SKUs are reported on stderr.
+    failures_only = sink is not None or args.changes
+
+    def commit_checkpoint() -> None:
+        # Outputs first: a SKU only counts as done once its results are written.
+        if store is not None:
+            save_snapshots()
+        if sink is not None:
+            sink.flush()
+        sys.stdout.flush()
+        checkpoint.commit()
+
+    failures = 0
+    deadline = Deadline(args.deadline) if args.deadline else None
+    # Only record parsing is worth a process hop; --raw just decodes text.
+    parse_pool = ParsePool(args.parse_workers) if args.parse_workers and as_records else None
+    try:
+        async for r in stream_batch(skus, service, client, concurrency=args.concurrency,
+                                    parse=parse, deadline=deadline, parse_pool=parse_pool):
+            if not r.ok:
+                failures += 1
+            elif store is not None:
+                # Committed in groups; one transaction per SKU would dominate.
+                pending_snapshots.append((r.sku, r.result))
+                if len(pending_snapshots) >= STORE_COMMIT_EVERY:
+                    save_snapshots()
+            if failures_only:
+                if not r.ok:
+                    write_json_line({"service": service.name, "sku": r.sku, "status": r.status,
+                                     "error": r.error}, sys.stderr)
+                elif sink is not None and not args.changes:
+                    sink.write_many(r.result)
+            else:
+                line = {"service": service.name, "sku": r.sku, "status": r.status,
+                        "error": r.error, "elapsed": r.elapsed}
+                if as_records:
+                    line["records"] = [rec.as_dict() for rec in r.result] if r.result is not None else None
+                else:
+                    line["body"] = r.result
+                write_json_line(line)
+            if checkpoint is not None:
+                checkpoint.record(service.name, r.sku, r.status, r.error)
+                if checkpoint.pending >= CHECKPOINT_COMMIT_EVERY:
+                    commit_checkpoint()
+    finally:
+        outputs_closed = False
+        try:
+            try:
+                if store is not None:
+                    try:
+                        save_snapshots()
+                    finally:
+                        store.close(commit=False)  # only what save_snapshots() wrote out
+            finally:
+                if parse_pool is not None:
+                    parse_pool.close()
+                if sink is not None:
+                    sink.close()
+            sys.stdout.flush()
+            outputs_closed = True
+        finally:
+            if checkpoint is not None:
+                checkpoint.close(commit=outputs_closed)
+    if reader.missing:
+        print(f"Skipped {reader.missing} input rows without a SKU field.", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def cmd_batch(args: argparse.Namespace, client: FcB2BClient) -> int:
+    service = _resolve_service(client, args.service, args.refresh_catalog)
+    if service is None:
+        return 2
+    if args.concurrency < 1:
+        print("--concurrency must be at least 1.", file=sys.stderr)
+        return 2
+    # One pooled connection per worker: the pool blocks without a timeout,
+    # so workers beyond max_per_host would wait out of reach of --deadline.
+    client.resize_pool(max(args.concurrency, POOL_MAX_PER_HOST))
+
+    from fcb2b_resilience import AdaptiveConcurrency, CircuitBreakerRegistry, RateLimiter
+    if args.breaker_threshold:
+        client.circuit_breakers = CircuitBreakerRegistry(failure_threshold=args.breaker_threshold,
+                                                         recovery_timeout=args.breaker_probe_interval)
+    if args.rate:
+        client.rate_limiter = RateLimiter(global_rate=args.rate)
+    if args.adaptive:
+        client.concurrency = AdaptiveConcurrency(initial=min(4, args.concurrency),
+                                                 max_limit=args.concurrency)
+    return asyncio.run(_run_batch(args, client, service))
+
+
+def cmd_query(args: argparse.Namespace, client: FcB2BClient) -> int:
+    from fcb2b_store import STORE_PATH, InventoryStore
+    with InventoryStore(args.store or STORE_PATH) as store:
+        for item in store.find(sku=args.sku, fob_point=args.fob_point, dye_lot=args.dye_lot):
+            write_json_line(item.as_dict())
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="fcB2B service tester. Run without a subcommand for the interactive mode."
+    )
+    parser.add_argument("--services-url", default=SERVICES_URL,
+                        help="Service catalog URL (e.g. a local fcb2b_mock_server)")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Attempts per call, including the first; retries back off "
+                             "with jitter and are re-signed (default: 3, 1 disables)")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT,
+                        help=f"Seconds to establish a connection (default: {CONNECT_TIMEOUT:g})")
+    parser.add_argument("--read-timeout", type=float, default=READ_TIMEOUT,
+                        help=f"Seconds to wait for data from the server (default: {READ_TIMEOUT:g})")
+    parser.add_argument("--request-timeout", type=float,
+                        help="Total seconds per call, including retries and the body download")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write per-call timing events (sign, DNS, connect, TLS, TTFB, "
+                             "download, parse) as JSON Lines to PATH ('-' for stderr) and print "
+                             "p50/p95/p99 per service to stderr at the end")
+    parser.add_argument("--refresh-catalog", action="store_true",
+                        help="Revalidate the cached service catalog even if it is still fresh")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("services", help="List the service catalog as JSON Lines.")
+    p.set_defaults(func=cmd_services)
+
+    p = sub.add_parser("call", help="Call one service for one or more SKUs.")
+    p.add_argument("service", help="Service name, e.g. StockCheck")
+    p.add_argument("--sku", action="append", required=True,
+                   help="SupplierItemSKU (repeat for several); stripped and upper-cased like batch input")
+    p.add_argument("--raw", action="store_true",
+                   help="Write the raw XML body instead of parsed records")
+    p.set_defaults(func=cmd_call)
+
+    p = sub.add_parser("batch", help="Call one service for every SKU in a file.")
+    p.add_argument("service", help="Service name, e.g. StockCheck")
+    p.add_argument("--input", required=True,
+                   help="File of SKUs: text (one per line), .csv or .jsonl ('-' for stdin)")
+    p.add_argument("--input-format", choices=("text", "csv", "jsonl"),
+                   help="Format of --input (default: from the file extension, text for stdin)")
+    p.add_argument("--sku-field",
+                   help="CSV column / JSON key holding the SKU (default: SupplierItemSKU or sku)")
+    p.add_argument("--shard", metavar="INDEX/COUNT",
+                   help="Only process shard INDEX (0-based) of COUNT, split by SKU hash, "
+                        "e.g. 0/4 .. 3/4 on four machines")
+    p.add_argument("--keep-duplicates", action="store_true",
+                   help="Call repeated SKUs again instead of skipping them")
+    p.add_argument("--concurrency", type=int, default=16,
+                   help="Maximum requests in flight; the connection pool is sized "
+                        "to match (default: 16)")
+    p.add_argument("--rate", type=float,
+                   help="Maximum requests per second across the batch")
+    p.add_argument("--adaptive", action="store_true",
+                   help="Adapt requests in flight (AIMD) up to --concurrency, "
+                        "backing off on 429/5xx and latency growth")
+    p.add_argument("--breaker-threshold", type=int, default=0,
+                   help="Open the circuit after this many consecutive failures "
+                        "and fail fast (default: 0, disabled)")
+    p.add_argument("--breaker-probe-interval", type=float, default=30.0,
+                   help="Seconds an open circuit waits before letting a probe through (default: 30)")
+    p.add_argument("--format", choices=("jsonl", "csv", "parquet"),
+                   help="Write one row per parsed record in this format instead of one "
+                        "JSON line per SKU; failed SKUs are reported on stderr")
+    p.add_argument("--output", default="-",
+                   help="File for --format output ('-' for stdout, the default; "
+                        "parquet needs a file)")
+    p.add_argument("--store", metavar="PATH",
+                   help="Also save InventoryInquiry results to this SQLite snapshot store")
+    p.add_argument("--max-age", type=float,
+                   help="With --store: skip SKUs whose stored snapshot is younger than this many seconds")
+    p.add_argument("--changes", action="store_true",
+                   help="With --store: output only changes against the stored snapshots "
+                        "(lots added/removed, quantity changes) instead of full results")
+    p.add_argument("--deadline", type=float,
+                   help="Seconds for the whole batch; calls still running are cut off "
+                        "and remaining SKUs are not started")
+    p.add_argument("--checkpoint", metavar="PATH",
+                   help="Record finished SKUs in this file; a rerun with the same file skips "
+                        "the SKUs that succeeded and retries the rest")
+    p.add_argument("--parse-workers", type=int, default=0,
+                   help="Parse responses in this many worker processes instead of on the "
+                        "request threads; helps with large responses (default: 0, off)")
+    p.add_argument("--raw", action="store_true",
+                   help="Write the raw XML body instead of parsed records")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("query", help="Query stored InventoryInquiry snapshots (no network).")
+    p.add_argument("--store", metavar="PATH", help="SQLite snapshot store (default: ~/.cache/fcb2b/inventory.sqlite3)")
+    p.add_argument("--sku", help="SupplierItemSKU")
+    p.add_argument("--fob-point", help="AvailableFOBPoint")
+    p.add_argument("--dye-lot", help="AvailableShadeOrDyeLot")
+    p.set_defaults(func=cmd_query)
+
+    return parser
+
+
 # ====== MAIN ======
 
-def main() -> None:
-    print("Fetching fcB2B service profiles from:\n ", SERVICES_URL)
+def run_interactive(client: FcB2BClient, refresh: bool = False) -> None:
+    print("Loading fcB2B service profiles from:\n ", client.services_url)
 
     try:
-        profiles = fetch_service_profiles()
+        profiles = load_service_profiles(client, refresh)
     except Exception as e:
         print("Failed to fetch or parse service profiles:", e)
         sys.exit(1)
@@ -318,7 +1193,7 @@ def main() -> None:
             break
 
         params = build_params_for_service(service)
-        call_service(service, params)
+        call_service(service, params, client)
 
         again = input("\nDo you want to test another service? (y/n): ").strip().lower()
         if again not in ("y", "yes"):
@@ -326,5 +1201,47 @@ def main() -> None:
             break
 
 
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_arg_parser().parse_args(argv)
+    client = get_default_client()
+    client.services_url = args.services_url
+    client.timeout = (args.connect_timeout, args.read_timeout)
+    client.request_deadline = args.request_timeout
+    if args.retries > 1:
+        from fcb2b_resilience import RetryPolicy
+        client.retry_policy = RetryPolicy(attempts=args.retries)
+    events = None
+    if args.metrics:
+        from fcb2b_metrics import Metrics
+        from fcb2b_sinks import JsonLinesSink
+        events = JsonLinesSink(sys.stderr if args.metrics == "-" else args.metrics)
+        client.metrics = Metrics(listeners=[events.write])
+
+    if args.command is None:
+        try:
+            run_interactive(client, args.refresh_catalog)
+        finally:
+            _finish_metrics(client, events)
+            client.close()
+        return
+
+    try:
+        code = args.func(args, client)
+    except Exception as e:
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        _finish_metrics(client, events)
+        client.close()
+    sys.exit(code)
+
+
+def _finish_metrics(client: FcB2BClient, events) -> None:
+    if events is None:
+        return
+    events.close()
+    print(client.metrics.format_summary(), file=sys.stderr)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,308 @@
+"""
+Streaming SKU input for batch runs.
+
+Features:
+- Reads SupplierItemSKU values from text (one per line), CSV or JSON Lines
+  files, or from stdin, one line at a time, so input size is not limited
+  by memory.
+- Normalizes SKUs (surrounding whitespace stripped, upper-cased).
+- Drops duplicates with bounded memory: exact (a set) up to
+  EXACT_DEDUP_LIMIT distinct SKUs, then a Bloom filter.
+- Shards deterministically by hash: with shard=(i, n) only SKUs whose hash
+  falls in shard i of n are yielded, so n processes or machines reading
+  the same list each get a disjoint part and together cover all of it.
+
+Usage:
+    from fcb2b_input import read_skus
+
+    for sku in read_skus("skus.csv", shard=(0, 4)):
+        ...
+
+    # On the command line:
+    python fcb2b_client.py batch StockCheck --input skus.jsonl --shard 0/4
+"""
+
+import csv
+import hashlib
+import json
+import math
+import sys
+from typing import Iterator, Optional, Set, TextIO, Tuple
+
+# ====== CONFIGURATION ======
+
+INPUT_FORMATS = ("text", "csv", "jsonl")
+SKU_FIELDS = ("SupplierItemSKU", "sku")   # CSV/JSONL field names tried, case-insensitively
+
+EXACT_DEDUP_LIMIT = 1_000_000    # distinct SKUs kept in a set before switching to a Bloom filter
+BLOOM_CAPACITY = 10_000_000      # SKUs the Bloom filter is sized for
+BLOOM_ERROR_RATE = 1e-4          # false-positive rate at capacity (unique SKUs wrongly dropped)
+
+Shard = Tuple[int, int]          # (index, count), index counted from 0
+
+# ====== NORMALIZING AND SHARDING ======
+
+def normalize_sku(value: str) -> str:
+    return value.strip().upper()
+
+
+def _sku_hash(sku: str) -> int:
+    # Stable across processes and machines, unlike hash() with PYTHONHASHSEED.
+    return int.from_bytes(hashlib.blake2b(sku.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_of(sku: str, count: int) -> int:
+    """
+    The shard (0 .. count-1) a normalized SKU belongs to.
+    """
+    return _sku_hash(sku) % count
+
+
+def parse_shard(spec: str) -> Shard:
+    """
+    Parse "INDEX/COUNT" (e.g. "0/4") into (index, count).
+    """
+    try:
+        index_text, count_text = spec.split("/")
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r} (expected INDEX/COUNT, e.g. 0/4)") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r} (INDEX must be 0 .. COUNT-1)")
+    return index, count
+
+
+# ====== DEDUPLICATION ======
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. Membership tests can give false
+    positives (at about error_rate once capacity items were added) but
+    never false negatives.
+    """
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> bool:
+        """
+        Add value; True if it was (probably) already present.
+        """
+        present = True
+        bits = self._bits
+        for pos in self._positions(value):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        return present
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class SkuDeduper:
+    """
+    Remembers SKUs seen so far. Exact until exact_limit distinct SKUs,
+    after which everything moves into a BloomFilter and memory stops
+    growing; from then on a rare unique SKU may be taken for a duplicate.
+    """
+
+    def __init__(
+        self,
+        exact_limit: int = EXACT_DEDUP_LIMIT,
+        bloom_capacity: int = BLOOM_CAPACITY,
+        error_rate: float = BLOOM_ERROR_RATE,
+    ):
+        self.exact_limit = exact_limit
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self._seen: Optional[Set[str]] = set()
+        self._bloom: Optional[BloomFilter] = None
+
+    @property
+    def exact(self) -> bool:
+        return self._bloom is None
+
+    def seen(self, sku: str) -> bool:
+        """
+        Record sku; True if it was seen before.
+        """
+        if self._bloom is not None:
+            return self._bloom.add(sku)
+        if sku in self._seen:
+            return True
+        self._seen.add(sku)
+        if len(self._seen) > self.exact_limit:
+            self._bloom = BloomFilter(max(self.bloom_capacity, len(self._seen)), self.error_rate)
+            for seen in self._seen:
+                self._bloom.add(seen)
+            self._seen = None
+        return False
+
+
+# ====== READERS ======
+
+def detect_format(path: str) -> str:
+    """
+    Input format from the file extension; text for anything else and stdin.
+    """
+    name = path.lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "text"
+
+
+def _find_field(names, field: Optional[str]) -> str:
+    wanted = [field] if field else list(SKU_FIELDS)
+    by_lower = {name.strip().lower(): name for name in names}
+    for name in wanted:
+        if name.lower() in by_lower:
+            return by_lower[name.lower()]
+    raise ValueError(f"No SKU field ({' or '.join(wanted)}) in the input")
+
+
+def _text_values(fh: TextIO) -> Iterator[str]:
+    # Blank lines and lines starting with '#' are skipped.
+    for line in fh:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+# The value readers yield None for a row that has no SKU (short CSV row,
+# JSON object without the field) so the caller can count it.
+
+def _csv_values(fh: TextIO, field: Optional[str]) -> Iterator[Optional[str]]:
+    reader = csv.reader(fh)
+    header = next(reader, None)
+    if header is None:
+        return
+    column = header.index(_find_field(header, field))
+    for row in reader:
+        if row:
+            yield row[column] if len(row) > column else None
+
+
+def _jsonl_values(fh: TextIO, field: Optional[str]) -> Iterator[Optional[str]]:
+    # Each line is an object with a SKU field, or a bare JSON string.
+    key = None
+    for lineno, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {lineno}: invalid JSON ({e})") from None
+        if isinstance(obj, str):
+            yield obj
+        elif isinstance(obj, dict):
+            if key is None or key not in obj:
+                try:
+                    key = _find_field(obj, field)
+                except ValueError:
+                    yield None
+                    continue
+            value = obj[key]
+            yield str(value) if value is not None else None
+        else:
+            raise ValueError(f"Line {lineno}: expected an object or a string")
+
+
+class SkuReader:
+    """
+    Iterate normalized, deduplicated SKUs of one shard from a file or stdin
+    ('-'). fmt is "text", "csv" or "jsonl" (default: from the extension);
+    field names the CSV column / JSON key (default: SupplierItemSKU or sku).
+
+    The counters (read, missing, duplicates, skipped_shard, yielded) are
+    updated as the input is consumed; missing counts CSV/JSONL rows without
+    a SKU, which are skipped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        field: Optional[str] = None,
+        normalize: bool = True,
+        dedupe: bool = True,
+        shard: Optional[Shard] = None,
+        deduper: Optional[SkuDeduper] = None,
+    ):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        if self.fmt not in INPUT_FORMATS:
+            raise ValueError(f"Unknown input format: {self.fmt} (expected one of {', '.join(INPUT_FORMATS)})")
+        self.field = field
+        self.normalize = normalize
+        self.shard = shard
+        self.deduper = (deduper or SkuDeduper()) if dedupe else None
+        self.read = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.skipped_shard = 0
+        self.yielded = 0
+
+    def _values(self, fh: TextIO) -> Iterator[Optional[str]]:
+        if self.fmt == "csv":
+            return _csv_values(fh, self.field)
+        if self.fmt == "jsonl":
+            return _jsonl_values(fh, self.field)
+        return _text_values(fh)
+
+    def __iter__(self) -> Iterator[str]:
+        if self.path == "-":
+            fh, owned = sys.stdin, False
+        else:
+            fh, owned = open(self.path, encoding="utf-8", newline=""), True
+        index, count = self.shard or (0, 1)
+        try:
+            for value in self._values(fh):
+                if value is None:
+                    self.missing += 1
+                    continue
+                sku = normalize_sku(value) if self.normalize else value
+                if not sku:
+                    continue
+                self.read += 1
+                # Shard first: each shard then only remembers its own SKUs.
+                if count > 1 and shard_of(sku, count) != index:
+                    self.skipped_shard += 1
+                    continue
+                if self.deduper is not None and self.deduper.seen(sku):
+                    self.duplicates += 1
+                    continue
+                self.yielded += 1
+                yield sku
+        finally:
+            if owned:
+                fh.close()
+
+
+def read_skus(
+    path: str,
+    fmt: Optional[str] = None,
+    field: Optional[str] = None,
+    normalize: bool = True,
+    dedupe: bool = True,
+    shard: Optional[Shard] = None,
+) -> Iterator[str]:
+    """
+    Shorthand for iter(SkuReader(...)).
+    """
+    return iter(SkuReader(path, fmt, field, normalize, dedupe, shard))
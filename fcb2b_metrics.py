@@ -0,0 +1,354 @@
+"""
+Latency instrumentation for fcB2B calls.
+
+Features:
+- RequestTiming breaks one call attempt into phases: waiting for rate
+  limit/concurrency capacity, signing, DNS, TCP connect, TLS handshake,
+  time to first byte, body download and (recorded separately, by whoever
+  parses the body) parsing. DNS/connect/TLS are only set when the attempt
+  opened a new connection; with a reused pooled connection they stay None.
+- TimedHTTPAdapter is a requests adapter whose urllib3 connections fill in
+  the network phases of the RequestTiming active on the calling thread.
+  With no timing active they behave exactly like the stock ones.
+- Metrics aggregates the phases into log-bucketed histograms per service
+  (p50/p95/p99 in constant memory) and passes every timing as a structured
+  event (a plain dict) to its listeners, e.g. a JSON Lines sink.
+
+FcB2BClient times every call; give it a Metrics to keep the numbers:
+
+Usage:
+    from fcb2b_metrics import Metrics
+    from fcb2b_sinks import JsonLinesSink
+
+    events = JsonLinesSink("events.jsonl")
+    client = FcB2BClient(metrics=Metrics(listeners=[events.write]))
+    ...
+    print(client.metrics.format_summary())
+    events.close()
+"""
+
+import math
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
+
+# ====== CONFIGURATION ======
+
+PHASES = ("wait", "sign", "dns", "connect", "tls", "ttfb", "download", "parse", "total")
+PERCENTILES = (50, 95, 99)
+
+HISTOGRAM_MIN = 1e-6          # seconds; smaller values share the lowest bucket
+HISTOGRAM_PRECISION = 0.02    # relative error of reported percentiles
+
+Event = Dict[str, Any]
+
+# ====== TIMINGS ======
+
+@dataclass
+class RequestTiming:
+    """
+    Phases of one call attempt, in seconds; None when a phase did not
+    happen (e.g. dns/connect/tls on a reused connection, download for a
+    streamed response). total covers the attempt from the capacity wait to
+    the end of the download.
+    """
+    service: str
+    request_id: Optional[str] = None    # the GlobalIdentifier param
+    sku: Optional[str] = None
+    started_at: float = 0.0             # wall-clock time
+    status: Optional[int] = None
+    error: Optional[str] = None
+    new_connection: bool = False
+    wait: Optional[float] = None
+    sign: Optional[float] = None
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    tls: Optional[float] = None
+    ttfb: Optional[float] = None
+    download: Optional[float] = None
+    parse: Optional[float] = None
+    total: Optional[float] = None
+    _headers_at: Optional[float] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def for_request(cls, service_name: str, params: Dict[str, str]) -> "RequestTiming":
+        return cls(service_name, params.get("GlobalIdentifier"), params.get("SupplierItemSKU"), time.time())
+
+    def body_read(self) -> None:
+        """
+        Mark the end of the body download (measured from the headers).
+        """
+        if self._headers_at is not None:
+            self.download = time.perf_counter() - self._headers_at
+
+    def as_dict(self) -> Event:
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+
+def format_timing(timing: RequestTiming) -> str:
+    """
+    One line such as "sign 0.1 ms | dns 1.9 ms | ... | total 85.0 ms".
+    """
+    parts = [f"{phase} {getattr(timing, phase) * 1000:.1f} ms"
+             for phase in PHASES if getattr(timing, phase) is not None]
+    if not timing.new_connection:
+        parts.append("reused connection")
+    return " | ".join(parts)
+
+
+_active = threading.local()
+
+
+class timing_scope:
+    """
+    Make timing the RequestTiming that connections on this thread report
+    to, for the duration of a with block.
+    """
+
+    def __init__(self, timing: RequestTiming):
+        self.timing = timing
+
+    def __enter__(self) -> RequestTiming:
+        self._previous = getattr(_active, "timing", None)
+        _active.timing = self.timing
+        return self.timing
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.timing = self._previous
+
+
+# ====== INSTRUMENTED CONNECTIONS ======
+
+def _resolve(host: str, port: int) -> List[str]:
+    addresses = []
+    for *_, sockaddr in socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class _TimedConnection:
+    """
+    Mixin for urllib3 connections. Splits name resolution from the TCP
+    connect by resolving first and then connecting to each address in
+    turn, as urllib3's create_connection does.
+    """
+
+    def _new_conn(self):
+        timing = getattr(_active, "timing", None)
+        if timing is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            addresses = _resolve(self._dns_host, self.port)
+        except OSError:
+            return super()._new_conn()  # let urllib3 raise its usual NameResolutionError
+        resolved = time.perf_counter()
+        timing.dns = resolved - start
+
+        host, error = self._dns_host, None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = host
+        timing.connect = time.perf_counter() - resolved
+        timing.new_connection = True
+        return sock
+
+    def getresponse(self, *args, **kwargs):
+        timing = getattr(_active, "timing", None)
+        start = time.perf_counter()
+        resp = super().getresponse(*args, **kwargs)
+        if timing is not None:
+            timing._headers_at = time.perf_counter()
+            timing.ttfb = timing._headers_at - start
+        return resp
+
+
+class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+
+    def connect(self):
+        timing = getattr(_active, "timing", None)
+        start = time.perf_counter()
+        super().connect()
+        if timing is not None:
+            # connect() = _new_conn() (dns + connect) + proxy tunnel + handshake
+            timing.tls = time.perf_counter() - start - (timing.dns or 0.0) - (timing.connect or 0.0)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools use the timed connections.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+# ====== AGGREGATION ======
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of durations in seconds. Memory depends on the
+    range of values, not their number; percentiles are accurate to within
+    precision (relative).
+    """
+
+    def __init__(self, precision: float = HISTOGRAM_PRECISION):
+        self._log_base = math.log1p(2 * precision)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = int(math.log(max(seconds, HISTOGRAM_MIN) / HISTOGRAM_MIN) / self._log_base)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Approximate q-th percentile (0-100), None when empty.
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Geometric middle of the bucket, kept within what was observed.
+                value = HISTOGRAM_MIN * math.exp((index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def stats(self) -> Dict[str, float]:
+        result = {"count": self.count, "mean": self.sum / self.count if self.count else 0.0}
+        for q in PERCENTILES:
+            result[f"p{q}"] = self.percentile(q)
+        result["max"] = self.max
+        return result
+
+
+class Metrics:
+    """
+    Per-service, per-phase latency histograms plus an event stream.
+
+    record() takes the RequestTiming of a finished attempt (FcB2BClient
+    calls it), record_parse() the parse time of a body. Each turns into
+    one event dict, "request" or "parse" (joined on request_id), handed to
+    every listener. Listeners are called one at a time, so a plain sink's
+    write() can be used directly.
+    """
+
+    def __init__(
+        self,
+        listeners: Optional[Iterable[Callable[[Event], None]]] = None,
+        precision: float = HISTOGRAM_PRECISION,
+    ):
+        self.precision = precision
+        self._listeners = list(listeners or [])
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[Event], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _observe(self, service: str, phase: str, seconds: float) -> None:
+        hist = self._histograms.get((service, phase))
+        if hist is None:
+            hist = self._histograms[(service, phase)] = LatencyHistogram(self.precision)
+        hist.observe(seconds)
+
+    def _emit(self, event: Event) -> None:
+        for listener in self._listeners:
+            listener(event)
+
+    def record(self, timing: RequestTiming) -> None:
+        with self._lock:
+            for phase in PHASES:
+                value = getattr(timing, phase)
+                if value is not None and phase != "parse":
+                    self._observe(timing.service, phase, value)
+            self._emit({"event": "request", **timing.as_dict()})
+
+    def record_parse(self, service: str, seconds: float, timing: Optional[RequestTiming] = None) -> None:
+        if timing is not None:
+            timing.parse = seconds
+        with self._lock:
+            self._observe(service, "parse", seconds)
+            self._emit({
+                "event": "parse",
+                "service": service,
+                "request_id": timing.request_id if timing else None,
+                "sku": timing.sku if timing else None,
+                "parse": seconds,
+            })
+
+    def histogram(self, service: str, phase: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get((service, phase))
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        {service: {phase: {count, mean, p50, p95, p99, max}}}, phases in
+        PHASES order.
+        """
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for service in sorted({s for s, _ in self._histograms}):
+                result[service] = {
+                    phase: self._histograms[(service, phase)].stats()
+                    for phase in PHASES if (service, phase) in self._histograms
+                }
+            return result
+
+    def format_summary(self) -> str:
+        """
+        The summary as a text table, times in milliseconds.
+        """
+        lines = [f"{'service':<20} {'phase':<9} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+        for service, phases in self.summary().items():
+            for phase, s in phases.items():
+                lines.append(f"{service:<20} {phase:<9} {s['count']:>7} "
+                             + " ".join(f"{s[k] * 1000:>9.2f}" for k in ("p50", "p95", "p99", "max")))
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the fcB2B server, for offline and load testing.
+
+Features:
+- Serves /services (the catalog) and the InventoryInquiry, RelatedItems and
+  StockCheck endpoints, using the files in sample_responses/ as templates.
+  Catalog entries point at this server instead of the live host.
+- Verifies every request's HMAC-SHA256 signature the same way the signing
+  overview describes (403 on a missing or bad signature).
+- Answers with the requested SupplierItemSKU and a fresh TimeStamp, and can
+  repeat the item rows to produce payloads of any size.
+- Configurable latency (with jitter) and error rate, to exercise retries,
+  rate limiting and timeouts.
+
+Usage:
+    python fcb2b_mock_server.py --port 8080 --latency 0.05 --error-rate 0.01 --items 500
+    python fcb2b_client.py --services-url http://127.0.0.1:8080/services services
+
+Or in-process:
+    from fcb2b_mock_server import MockConfig, start_mock_server
+
+    server = start_mock_server(MockConfig(items=1000))
+    client = FcB2BClient(services_url=server.services_url)
+    ...
+    server.shutdown()
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from fcb2b_client import SECRET_KEY, canonical_query
+
+# ====== CONFIGURATION ======
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_responses")
+SERVICES_PATH = "/services"
+SERVICE_PATH_PREFIX = "/fcb2b/"
+
+# service name -> repeated item element (None: the response has no item list)
+ITEM_TAGS: Dict[str, Optional[str]] = {
+    "InventoryInquiry": "AvailableItem",
+    "RelatedItems": "RelatedItem",
+    "StockCheck": None,
+}
+
+REQUIRED_PARAMS = ("GlobalIdentifier", "TimeStamp", "apiKey", "Signature")
+
+# ====== RESPONSE TEMPLATES ======
+
+class ResponseTemplate:
+    """
+    A sample response split into head, item rows and tail, so it can be
+    re-rendered for any SKU with any number of rows.
+    """
+
+    def __init__(self, xml: str, item_tag: Optional[str]):
+        items: List[str] = []
+        if item_tag:
+            items = re.findall(rf"[ \t]*<{item_tag}>.*?</{item_tag}>\n", xml, re.S)
+        if items:
+            start = xml.index(items[0])
+            end = xml.index(items[-1]) + len(items[-1])
+            self.head, self.tail = xml[:start], xml[end:]
+        else:
+            self.head, self.tail = xml, ""
+        self.items = items
+
+    def render(self, sku: Optional[str] = None, rows: Optional[int] = None) -> bytes:
+        """
+        Build a response. rows=None keeps the sample's own rows; otherwise
+        the sample rows are repeated (or cut) to exactly `rows` entries.
+        """
+        head = self.head
+        if sku is not None:
+            # Only the head carries the requested SKU; item rows keep their own.
+            head = re.sub(r"<SupplierItemSKU>[^<]*</SupplierItemSKU>",
+                          f"<SupplierItemSKU>{escape(sku)}</SupplierItemSKU>", head, count=1)
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        head = re.sub(r"<TimeStamp>[^<]*</TimeStamp>", f"<TimeStamp>{timestamp}</TimeStamp>", head, count=1)
+
+        if rows is None or not self.items:
+            body = "".join(self.items)
+        else:
+            body = "".join(self.items[i % len(self.items)] for i in range(rows))
+        return (head + body + self.tail).encode("utf-8")
+
+
+def read_sample(service_name: str) -> str:
+    with open(os.path.join(SAMPLES_DIR, f"{service_name}_SampleResponse.xml"), encoding="utf-8") as fh:
+        return fh.read()
+
+
+def load_templates() -> Dict[str, ResponseTemplate]:
+    return {name: ResponseTemplate(read_sample(name), tag) for name, tag in ITEM_TAGS.items()}
+
+
+def render_catalog(base_url: str) -> bytes:
+    """
+    The sample catalog with every HTTPSRequestPath pointing at base_url.
+    """
+    xml = read_sample("ServiceProfile")
+    xml = re.sub(
+        r"<HTTPSRequestPath>[^<]*/([^/<]+)</HTTPSRequestPath>",
+        lambda m: f"<HTTPSRequestPath>{base_url}{SERVICE_PATH_PREFIX}{m.group(1)}</HTTPSRequestPath>",
+        xml,
+    )
+    return xml.encode("utf-8")
+
+
+# ====== SIGNATURE CHECK ======
+
+def verify_signature(host: str, path: str, query: str, secret_key: str) -> Tuple[bool, str]:
+    """
+    Recompute the signature for a request and compare it with the one sent.
+    Returns (ok, reason).
+    """
+    pairs = urllib.parse.parse_qsl(query, keep_blank_values=True)
+    params = dict(pairs)
+    if len(params) != len(pairs):
+        return False, "duplicate query parameter"
+    missing = [p for p in REQUIRED_PARAMS if p not in params]
+    if missing:
+        return False, f"missing parameter(s): {', '.join(missing)}"
+
+    signature = params.pop("Signature")
+    string_to_sign = f"GET\n{host}\n{path}\n{canonical_query(params)}"
+    digest = hmac.new(secret_key.encode("utf-8"), string_to_sign.encode("utf-8"), hashlib.sha256).digest()
+    expected = base64.b64encode(digest).decode()
+
+    if not hmac.compare_digest(expected, signature):
+        return False, "signature mismatch"
+    return True, ""
+
+
+# ====== SERVER ======
+
+@dataclass
+class MockConfig:
+    host: str = "127.0.0.1"
+    port: int = 0                   # 0 picks a free port
+    secret_key: str = SECRET_KEY
+    latency: float = 0.0            # seconds added to every service response
+    jitter: float = 0.0             # +/- uniform jitter around latency
+    error_rate: float = 0.0         # fraction of service calls answered with an error
+    error_statuses: List[int] = field(default_factory=lambda: [500, 503])
+    items: Optional[int] = None     # item rows per response (None: as in the sample)
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    ok: int = 0
+    errors: int = 0
+    rejected: int = 0               # bad or missing signature
+    bytes_sent: int = 0
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so client connection pooling is exercised
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid delayed-ACK stalls
+    server: "MockServer"
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == SERVICES_PATH:
+            self._send_catalog()
+            return
+        if url.path.startswith(SERVICE_PATH_PREFIX):
+            name = url.path[len(SERVICE_PATH_PREFIX):]
+            template = self.server.templates.get(name)
+            if template is not None:
+                self._send_service(url, template)
+                return
+        self._send(404, b"Not found", "text/plain")
+
+    def _send_catalog(self) -> None:
+        catalog = self.server.catalog
+        etag = f'"{hashlib.sha256(catalog).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", "application/xml", {"ETag": etag})
+            return
+        self._send(200, catalog, "application/xml", {"ETag": etag})
+
+    def _send_service(self, url: urllib.parse.SplitResult, template: ResponseTemplate) -> None:
+        config = self.server.config
+        stats = self.server.stats
+
+        ok, reason = verify_signature(self.headers.get("Host", ""), url.path, url.query, config.secret_key)
+        if not ok:
+            with self.server.stats_lock:
+                stats.requests += 1
+                stats.rejected += 1
+            self._send(403, reason.encode("utf-8"), "text/plain")
+            return
+
+        delay = config.latency + random.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if config.error_rate and random.random() < config.error_rate:
+            with self.server.stats_lock:
+                stats.requests += 1
+                stats.errors += 1
+            self._send(random.choice(config.error_statuses), b"Simulated failure", "text/plain")
+            return
+
+        sku = urllib.parse.parse_qs(url.query).get("SupplierItemSKU", [None])[0]
+        body = template.render(sku, config.items)
+        with self.server.stats_lock:
+            stats.requests += 1
+            stats.ok += 1
+            stats.bytes_sent += len(body)
+        self._send(200, body, "application/xml")
+
+    def _send(self, status: int, body: bytes, content_type: str,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, verbose: bool = False):
+        super().__init__((config.host, config.port), MockHandler)
+        self.config = config
+        self.verbose = verbose
+        self.stats = MockStats()
+        self.stats_lock = threading.Lock()
+        self.templates = load_templates()
+        self.catalog = render_catalog(self.base_url)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def services_url(self) -> str:
+        return self.base_url + SERVICES_PATH
+
+
+def start_mock_server(config: Optional[MockConfig] = None, verbose: bool = False) -> MockServer:
+    """
+    Start a mock server on a background thread. Call .shutdown() to stop it.
+    """
+    server = MockServer(config or MockConfig(), verbose)
+    threading.Thread(target=server.serve_forever, name="fcb2b-mock", daemon=True).start()
+    return server
+
+
+# ====== MAIN ======
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local mock fcB2B server for offline load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--secret-key", default=SECRET_KEY, help="Key used to verify signatures")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each service response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds around --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of service calls that fail (0-1)")
+    parser.add_argument("--error-status", type=int, action="append",
+                        help="HTTP status for simulated failures (repeatable; default 500 and 503)")
+    parser.add_argument("--items", type=int, help="Item rows per InventoryInquiry/RelatedItems response")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        host=args.host,
+        port=args.port,
+        secret_key=args.secret_key,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_statuses=args.error_status or [500, 503],
+        items=args.items,
+    )
+    server = MockServer(config, args.verbose)
+    print(f"Mock fcB2B server listening on {server.base_url}")
+    print(f"Service catalog: {server.services_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        s = server.stats
+        print(f"\nRequests: {s.requests}  OK: {s.ok}  Errors: {s.errors}  "
+              f"Rejected: {s.rejected}  Bytes sent: {s.bytes_sent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Streaming parsers for fcB2B item service responses.
+
+Each parser walks the response with ET.iterparse and yields one compact
+record per item as soon as its closing tag is seen. Finished elements are
+detached from the tree, so even very large InventoryInquiry or RelatedItems
+payloads are never held in memory as a whole document.
+
+Response shapes (see sample_responses/):
+- InventoryInquiry : InventoryInquiry/AvailableItems/AvailableItem
+- RelatedItems     : RelatedItems/RelatedItem (requested SKU under Data)
+- StockCheck       : a single StockCheck element
+
+Usage:
+    from fcb2b_parsers import iter_records
+
+    with open("sample_responses/InventoryInquiry_SampleResponse.xml", "rb") as fh:
+        for item in iter_records("InventoryInquiry", fh):
+            print(item.fob_point, item.dye_lot, item.quantity)
+"""
+
+import io
+import xml.etree.ElementTree as ET
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union
+
+from fcb2b_client import FcB2BClient, ServiceProfile, get_default_client
+
+Source = Union[bytes, str, BinaryIO]
+
+# ====== RECORDS ======
+
+class Record:
+    """
+    Base for the parsed item records. Subclasses only list their fields in
+    __slots__, which keeps each record small (no per-instance __dict__).
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self) -> Dict[str, object]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+class AvailableItem(Record):
+    """One AvailableItem row of an InventoryInquiry response."""
+    __slots__ = ("sku", "description", "fob_point", "dye_lot", "roll_or_cut", "uom", "quantity")
+
+
+class RelatedItem(Record):
+    """One RelatedItem row; parent_sku is the SKU that was asked about."""
+    __slots__ = ("parent_sku", "sku", "description", "drop_flag", "fob_point", "dye_lot",
+                 "roll_or_cut", "uom", "quantity", "future_date", "future_qty")
+
+
+class StockCheckItem(Record):
+    """The single StockCheck element of a StockCheck response."""
+    __slots__ = ("sku", "description", "drop_flag", "dye_lot", "roll_or_cut", "uom",
+                 "quantity", "timestamp")
+
+
+# ====== FIELD CONVERSION ======
+
+# XML element name -> record field
+FIELD_NAMES = {
+    "SupplierItemSKU": "sku",
+    "TextDescription": "description",
+    "DropFlag": "drop_flag",
+    "AvailableFOBPoint": "fob_point",
+    "AvailableShadeOrDyeLot": "dye_lot",
+    "RollOrCutFlag": "roll_or_cut",
+    "AvailableUnitOfMeasure": "uom",
+    "AvailableQuantity": "quantity",
+    "FutureAvailableDate": "future_date",
+    "FutureAvailableQty": "future_qty",
+    "TimeStamp": "timestamp",
+}
+
+
+def _decimal(text: str) -> Optional[Decimal]:
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def _flag(text: str) -> bool:
+    return text.lower() == "true"
+
+
+CONVERTERS: Dict[str, Callable[[str], object]] = {
+    "quantity": _decimal,
+    "future_qty": _decimal,
+    "drop_flag": _flag,
+    "roll_or_cut": _flag,
+}
+
+
+def convert_field(field: str, text: Optional[str]) -> object:
+    """
+    Convert element text for a record field. Empty elements become None.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    conv = CONVERTERS.get(field)
+    return conv(text) if conv else text
+
+
+def local_name(tag: str) -> str:
+    """'{namespace}Name' -> 'Name'."""
+    return tag.rpartition("}")[2]
+
+
+# ====== STREAMING PARSER ======
+
+class RecordParser:
+    """
+    Turns iterparse ("start", "end") events into records.
+
+    item_tag    : element that becomes one record
+    header_tags : {element: field} values picked up outside the items and
+                  copied onto every record (e.g. the requested SKU)
+    """
+
+    def __init__(self, item_tag: str, record_type: Type[Record],
+                 header_tags: Optional[Dict[str, str]] = None):
+        self.item_tag = item_tag
+        self.record_type = record_type
+        self.header_tags = header_tags or {}
+        self.header: Dict[str, object] = {}
+        self._stack: List[ET.Element] = []
+        self._in_item = False
+
+    def feed(self, event: str, elem: ET.Element) -> Optional[Record]:
+        """
+        Handle one event; return a record when an item element closes.
+        """
+        if event == "start":
+            self._stack.append(elem)
+            if local_name(elem.tag) == self.item_tag:
+                self._in_item = True
+            return None
+
+        self._stack.pop()
+        name = local_name(elem.tag)
+
+        if name == self.item_tag:
+            self._in_item = False
+            fields = dict(self.header)
+            for child in elem:
+                field = FIELD_NAMES.get(local_name(child.tag))
+                if field in self.record_type.__slots__:
+                    fields[field] = convert_field(field, child.text)
+            self._detach(elem)
+            return self.record_type(**fields)
+
+        if not self._in_item and name in self.header_tags:
+            field = self.header_tags[name]
+            self.header[field] = convert_field(field, elem.text)
+        return None
+
+    def _detach(self, elem: ET.Element) -> None:
+        # Drop the finished item from its parent so the tree never grows.
+        # Not clear()ed: its tail may still be wanted by other consumers of
+        # the same events (fcb2b_render.parse_once), and once unlinked it is
+        # freed anyway.
+        if self._stack:
+            self._stack[-1].remove(elem)
+
+
+# service name -> (item tag, record type, header tags)
+SERVICE_LAYOUTS: Dict[str, Tuple[str, Type[Record], Dict[str, str]]] = {
+    "InventoryInquiry": ("AvailableItem", AvailableItem,
+                         {"SupplierItemSKU": "sku", "TextDescription": "description"}),
+    "RelatedItems": ("RelatedItem", RelatedItem, {"SupplierItemSKU": "parent_sku"}),
+    "StockCheck": ("StockCheck", StockCheckItem, {}),
+}
+
+
+def record_parser_for(service_name: str) -> Optional[RecordParser]:
+    """
+    Return a fresh RecordParser for the service, or None if it has no
+    known response layout.
+    """
+    layout = SERVICE_LAYOUTS.get(service_name)
+    if layout is None:
+        return None
+    item_tag, record_type, header_tags = layout
+    return RecordParser(item_tag, record_type, header_tags)
+
+
+def iter_records(service_name: str, source: Source) -> Iterator[Record]:
+    """
+    Stream records out of a response. source may be the body as bytes,
+    a file path, or a binary file object such as a streamed response.raw.
+    """
+    parser = record_parser_for(service_name)
+    if parser is None:
+        raise ValueError(f"No parser for service {service_name}")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        record = parser.feed(event, elem)
+        if record is not None:
+            yield record
+
+
+def iter_inventory_inquiry(source: Source) -> Iterator[AvailableItem]:
+    return iter_records("InventoryInquiry", source)
+
+
+def iter_related_items(source: Source) -> Iterator[RelatedItem]:
+    return iter_records("RelatedItems", source)
+
+
+def iter_stock_check(source: Source) -> Iterator[StockCheckItem]:
+    return iter_records("StockCheck", source)
+
+
+def parse_records(service_name: str, body: bytes) -> List[Record]:
+    """
+    Parse a complete response body into a list of records.
+    """
+    return list(iter_records(service_name, body))
+
+
+def stream_service_records(
+    service: ServiceProfile,
+    params: Dict[str, str],
+    client: Optional[FcB2BClient] = None,
+) -> Iterator[Record]:
+    """
+    Call a service and parse the body straight off the socket, without
+    buffering the whole response first.
+    """
+    client = client or get_default_client()
+    resp = client.request(service, params, stream=True)
+    with resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        yield from iter_records(service.name, resp.raw)
@@ -0,0 +1,529 @@
+"""
+Terminal rendering of fcB2B XML responses.
+
+Features:
+- XmlIndenter turns XMLPullParser events into indented XML text as the
+  document is parsed, so the body is never held as a DOM and output can be
+  written in chunks while parsing continues.
+- Finished elements are detached from the tree as soon as they are written,
+  so memory stays flat however many item rows a response has.
+- Bodies larger than PRETTY_MAX_BYTES are passed through unchanged instead
+  of being re-indented.
+- A single-pass tokenizer adds ANSI colors (tags cyan, attribute names
+  yellow, values green) and writes the result to a stream in chunks.
+  Attribute names may be namespaced (xmlns:ml, xsi:schemaLocation).
+- parse_once() parses a body a single time and produces the typed records,
+  the pretty text and the colored text together from the same events.
+
+Output is a declaration line, then one element per line indented by
+PRETTY_INDENT, with leaf text kept inline and empty elements self-closed.
+Whitespace between elements is replaced by the indentation, so no blank
+lines appear (unlike minidom's toprettyxml, which keeps them); comments and
+processing instructions are dropped.
+
+Usage:
+    from fcb2b_render import colorize_xml, pretty_xml, write_colorized_xml, write_pretty_xml
+
+    print(colorize_xml(pretty_xml(resp.text)))
+    write_pretty_xml(resp.content, sys.stdout)
+    write_colorized_xml(text, sys.stdout)
+
+    rendered = parse_once(resp.content, record_parser_for("StockCheck"), color=True)
+    rendered.records, rendered.pretty, rendered.colored
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+from xml.sax.saxutils import escape
+
+# ====== CONFIGURATION ======
+
+PRETTY_INDENT = "  "
+PRETTY_MAX_BYTES = 8 * 1024 * 1024  # larger bodies are written as-is
+FEED_CHUNK_SIZE = 64 * 1024         # bytes handed to the parser at a time
+OUTPUT_CHUNK_SIZE = 64 * 1024       # characters buffered before a chunk is emitted
+
+# ANSI colors
+CYAN = "\033[96m"
+YELLOW = "\033[93m"
+GREEN = "\033[92m"
+RESET = "\033[0m"
+
+XML_DECLARATION = '<?xml version="1.0" ?>'
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+
+Source = Union[bytes, str, BinaryIO, Iterable[bytes]]
+
+# ====== STREAMING INDENTER ======
+
+def _attr_value(value: str) -> str:
+    return '"' + escape(value, {'"': "&quot;"}) + '"'
+
+
+class _Scope(dict):
+    """
+    Namespace URI -> prefix in effect for an element, plus a cache of the
+    (name, opening tag) for attribute-less tags under that mapping.
+    Elements without namespace declarations share their parent's scope.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.tags: Dict[str, Tuple[str, str]] = {}
+
+
+class _Open:
+    """
+    An element that has been started but not yet closed.
+    """
+    __slots__ = ("elem", "name", "scope", "open_tag", "written")
+
+    def __init__(self, elem: ET.Element, name: str, scope: _Scope, open_tag: str):
+        self.elem = elem
+        self.name = name          # qualified name as written in the source
+        self.scope = scope
+        self.open_tag = open_tag
+        self.written = False      # opening tag already output (has children)
+
+
+class XmlIndenter:
+    """
+    Builds indented XML from ("start", "end", "start-ns") events.
+
+    Pass events in as they come out of an XMLPullParser (see EVENTS) and
+    collect the text with take(). An element's opening tag is held back
+    until its first child or its end, which decides between
+    <a>text</a>, <a/> and a multi-line block.
+
+    With detach=False finished elements are left in the tree, for when
+    another consumer of the same events still needs them.
+    """
+
+    EVENTS = ("start", "end", "start-ns")
+
+    def __init__(self, indent: str = PRETTY_INDENT, declaration: bool = True, detach: bool = True):
+        self.indent = indent
+        self.detach = detach
+        self._out: List[str] = [self._declaration(), "\n"] if declaration else []
+        self._size = sum(map(len, self._out))
+        self._stack: List[_Open] = []
+        self._root_scope = _Scope({XML_NS: "xml"})
+        self._new_ns: List[Tuple[str, str]] = []
+        self._last: Optional[ET.Element] = None  # closed element whose tail is pending
+
+    @property
+    def pending(self) -> int:
+        """
+        Characters produced but not yet taken.
+        """
+        return self._size
+
+    def take(self) -> str:
+        """
+        Return and forget everything produced so far.
+        """
+        text = "".join(self._out)
+        self._out.clear()
+        self._size = 0
+        return text
+
+    def feed(self, event: str, payload) -> None:
+        if event == "start-ns":
+            self._new_ns.append(payload)
+        elif event == "start":
+            self._start(payload)
+        elif event == "end":
+            self._end(payload)
+
+    # --- event handlers ---
+
+    def _start(self, elem: ET.Element) -> None:
+        if self._stack:
+            self._flush_parent()
+            scope = self._stack[-1].scope
+        else:
+            scope = self._root_scope
+
+        decls = []
+        if self._new_ns:
+            scope = _Scope(scope)
+            for prefix, uri in self._new_ns:
+                scope[uri] = prefix
+                decls.append((f"xmlns:{prefix}" if prefix else "xmlns", uri))
+            self._new_ns.clear()
+
+        if decls or elem.attrib:
+            name = self._qname(elem.tag, scope, attr=False)
+            attrs = decls + [(self._qname(k, scope, attr=True), v) for k, v in elem.attrib.items()]
+            open_tag = self._open_tag(name, attrs)
+        else:
+            # Item rows repeat the same few tags; build each one once.
+            cached = scope.tags.get(elem.tag)
+            if cached is None:
+                name = self._qname(elem.tag, scope, attr=False)
+                cached = scope.tags[elem.tag] = (name, self._open_tag(name, []))
+            name, open_tag = cached
+        self._stack.append(_Open(elem, name, scope, open_tag))
+
+    def _end(self, elem: ET.Element) -> None:
+        top = self._stack.pop()
+        depth = len(self._stack)
+        if not top.written:
+            self._line(depth, self._leaf(top.open_tag, top.name, elem.text))
+        else:
+            self._flush_tail(depth + 1)
+            self._line(depth, self._close_tag(top.name))
+
+        if self.detach and self._stack:
+            # Only the current child is still attached; drop it.
+            self._stack[-1].elem.remove(elem)
+        self._last = elem
+
+    def _flush_parent(self) -> None:
+        """
+        A child is starting: write the parent's opening tag and text, or
+        the previous sibling's tail.
+        """
+        parent = self._stack[-1]
+        depth = len(self._stack)
+        if not parent.written:
+            parent.written = True
+            self._line(depth - 1, parent.open_tag)
+            self._text_line(depth, parent.elem.text)
+        else:
+            self._flush_tail(depth)
+
+    def _flush_tail(self, depth: int) -> None:
+        if self._last is not None:
+            self._text_line(depth, self._last.tail)
+            self._last = None
+
+    # --- output ---
+
+    def _declaration(self) -> str:
+        return XML_DECLARATION
+
+    def _line(self, depth: int, markup: str) -> None:
+        line = self.indent * depth + markup + "\n"
+        self._out.append(line)
+        self._size += len(line)
+
+    def _text_line(self, depth: int, text: Optional[str]) -> None:
+        # Mixed content: whitespace is layout, anything else gets its own line.
+        if text and not text.isspace():
+            self._line(depth, self._text(text.strip()))
+
+    def _qname(self, tag: str, scope: _Scope, attr: bool) -> str:
+        if tag[0] != "{":
+            return tag
+        uri, local = tag[1:].split("}", 1)
+        prefix = scope.get(uri)
+        if prefix is None or (attr and not prefix):
+            # Unbound URI (or a default-namespace URI on an attribute):
+            # fall back to Clark notation rather than guess a prefix.
+            return tag
+        return f"{prefix}:{local}" if prefix else local
+
+    def _open_tag(self, name: str, attrs: List[Tuple[str, str]]) -> str:
+        parts = [name] + [f"{k}={_attr_value(v)}" for k, v in attrs]
+        return "<" + " ".join(parts) + ">"
+
+    def _close_tag(self, name: str) -> str:
+        return f"</{name}>"
+
+    def _text(self, text: str) -> str:
+        # Most item values (SKUs, lots, quantities) need no escaping.
+        if "&" in text or "<" in text or ">" in text:
+            return escape(text)
+        return text
+
+    def _leaf(self, open_tag: str, name: str, text: Optional[str]) -> str:
+        if not text:
+            return open_tag[:-1] + "/>"
+        return open_tag + self._text(text) + self._close_tag(name)
+
+
+# ====== PRETTY PRINTING ======
+
+def _iter_chunks(source: Source) -> Iterator[bytes]:
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), FEED_CHUNK_SIZE):
+            yield view[start:start + FEED_CHUNK_SIZE]
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(FEED_CHUNK_SIZE), b"")
+    else:
+        yield from source
+
+
+def _over_limit(source: Union[bytes, bytearray, str], max_bytes: int) -> bool:
+    # str bodies are measured as UTF-8, like the bytes they came from; only
+    # encode when the character count alone cannot decide.
+    if isinstance(source, str):
+        if len(source) > max_bytes:
+            return True
+        if len(source) * 4 <= max_bytes:
+            return False
+        return len(source.encode("utf-8")) > max_bytes
+    return len(source) > max_bytes
+
+
+def iter_pretty_xml(source: Source, indent: str = PRETTY_INDENT) -> Iterator[str]:
+    """
+    Yield the indented document in chunks of roughly OUTPUT_CHUNK_SIZE.
+
+    source may be the body as bytes or str, a binary file object, or an
+    iterable of byte chunks (e.g. resp.iter_content()). Raises
+    ET.ParseError on malformed XML, after yielding what came before it.
+    """
+    parser = ET.XMLPullParser(XmlIndenter.EVENTS)
+    indenter = XmlIndenter(indent)
+    for chunk in _iter_chunks(source):
+        parser.feed(chunk)
+        for event, payload in parser.read_events():
+            indenter.feed(event, payload)
+        if indenter.pending >= OUTPUT_CHUNK_SIZE:
+            yield indenter.take()
+    parser.close()
+    for event, payload in parser.read_events():
+        indenter.feed(event, payload)
+    yield indenter.take()
+
+
+def write_pretty_xml(
+    source: Union[bytes, str],
+    out: TextIO,
+    indent: str = PRETTY_INDENT,
+    max_bytes: int = PRETTY_MAX_BYTES,
+) -> bool:
+    """
+    Write the indented document to out chunk by chunk. Bodies over
+    max_bytes are written unchanged. Returns False if the body was written
+    as-is (too large or not well-formed XML).
+    """
+    if _over_limit(source, max_bytes):
+        out.write(source if isinstance(source, str) else source.decode("utf-8", errors="replace"))
+        return False
+    try:
+        for chunk in iter_pretty_xml(source, indent):
+            out.write(chunk)
+    except ET.ParseError:
+        # Part of the document may already be out; finish with the raw body
+        # so nothing is lost.
+        out.write("\n")
+        out.write(source if isinstance(source, str) else source.decode("utf-8", errors="replace"))
+        return False
+    return True
+
+
+def pretty_xml(raw_xml: str, max_bytes: int = PRETTY_MAX_BYTES) -> str:
+    """
+    Indented copy of raw_xml, or raw_xml itself if it is larger than
+    max_bytes (UTF-8 encoded) or not well-formed.
+    """
+    if _over_limit(raw_xml, max_bytes):
+        return raw_xml
+    try:
+        return "".join(iter_pretty_xml(raw_xml))
+    except ET.ParseError:
+        return raw_xml
+
+
+# ====== COLORIZING ======
+
+# Between tags: character data, or the start of some markup.
+_CONTENT_TOKEN = re.compile(r"""
+    (?P<text>[^<]+)
+  | (?P<cdata><!\[CDATA\[.*?\]\]>)
+  | (?P<opaque><!--.*?-->|<![^>]*>)
+  | (?P<open><\?|</?)(?P<name>[^\s/?<>]+)
+""", re.S | re.X)
+
+# Inside a tag: an attribute, or the end of the tag.
+_TAG_TOKEN = re.compile(r"""
+    (?P<space>\s+)(?P<attr>[^\s=/?>]+)(?P<eq>\s*=\s*)(?P<value>"[^"]*"|'[^']*')
+  | (?P<close>\s*[/?]?>)
+""", re.X)
+
+
+def _colored_pieces(xml: str) -> Iterator[str]:
+    pos, end = 0, len(xml)
+    content_match, tag_match = _CONTENT_TOKEN.match, _TAG_TOKEN.match
+
+    while pos < end:
+        m = content_match(xml, pos)
+        if m is None:
+            # A '<' that starts no markup we know; pass it through.
+            yield xml[pos]
+            pos += 1
+            continue
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "text" or kind == "cdata":
+            yield m.group()
+            continue
+        if kind == "opaque":
+            yield CYAN + m.group() + RESET
+            continue
+
+        # Tag name, then attributes up to the closing '>'. Cyan stays on
+        # until the first attribute switches colors.
+        parts = [CYAN, m.group()]
+        in_cyan = True
+        while pos < end:
+            t = tag_match(xml, pos)
+            if t is None:
+                break
+            pos = t.end()
+            if t.lastgroup == "close":
+                parts.append(t.group() if in_cyan else CYAN + t.group())
+                in_cyan = True
+                break
+            if in_cyan:
+                parts.append(RESET)
+                in_cyan = False
+            parts += [t.group("space"), YELLOW, t.group("attr"), RESET, t.group("eq"),
+                      GREEN, t.group("value"), RESET]
+        if in_cyan:
+            parts.append(RESET)
+        yield "".join(parts)
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[str]:
+    buf: List[str] = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= OUTPUT_CHUNK_SIZE:
+            yield "".join(buf)
+            buf.clear()
+            size = 0
+    yield "".join(buf)
+
+
+def iter_colorized_xml(xml: str) -> Iterator[str]:
+    """
+    Yield xml with ANSI colors added, in chunks of roughly
+    OUTPUT_CHUNK_SIZE. One left-to-right pass; text that does not look like
+    markup (e.g. a stray '<') is passed through uncolored.
+    """
+    return _chunked(_colored_pieces(xml))
+
+
+def write_colorized_xml(xml: str, out: TextIO) -> None:
+    """
+    Write xml to out with ANSI colors, chunk by chunk.
+    """
+    for chunk in iter_colorized_xml(xml):
+        out.write(chunk)
+
+
+def colorize_xml(xml: str) -> str:
+    """
+    Very lightweight XML syntax highlighter.
+    Colors:
+        - tags        = cyan
+        - attributes  = yellow
+        - attr values = green
+    """
+    return "".join(iter_colorized_xml(xml))
+
+
+# ====== PARSE ONCE ======
+
+class ColorXmlIndenter(XmlIndenter):
+    """
+    XmlIndenter that writes ANSI-colored markup, identical to
+    colorize_xml(pretty_xml(...)) but without a second pass over the text.
+    """
+
+    def _declaration(self) -> str:
+        return colorize_xml(XML_DECLARATION)
+
+    def _open_tag(self, name: str, attrs: List[Tuple[str, str]]) -> str:
+        if not attrs:
+            return f"{CYAN}<{name}>{RESET}"
+        parts = [CYAN, "<", name, RESET]
+        for k, v in attrs:
+            parts += [" ", YELLOW, k, RESET, "=", GREEN, _attr_value(v), RESET]
+        parts += [CYAN, ">", RESET]
+        return "".join(parts)
+
+    def _close_tag(self, name: str) -> str:
+        return f"{CYAN}</{name}>{RESET}"
+
+    def _leaf(self, open_tag: str, name: str, text: Optional[str]) -> str:
+        if not text:
+            return open_tag[:-len(">" + RESET)] + "/>" + RESET
+        return open_tag + self._text(text) + self._close_tag(name)
+
+
+@dataclass
+class RenderedResponse:
+    records: List[Any] = field(default_factory=list)
+    pretty: Optional[str] = None     # None unless requested
+    colored: Optional[str] = None
+
+
+def parse_once(
+    source: Source,
+    record_parser: Any = None,
+    pretty: bool = True,
+    color: bool = False,
+    indent: str = PRETTY_INDENT,
+    max_bytes: int = PRETTY_MAX_BYTES,
+) -> RenderedResponse:
+    """
+    Parse source once and build everything asked for from the same events.
+
+    record_parser is anything with feed(event, elem) -> record or None
+    (fcb2b_parsers.RecordParser, fcb2b_client.ServiceProfileParser); it
+    receives the "start"/"end" events and the records it returns are
+    collected. pretty / color select the plain and ANSI-colored indented
+    text. Bodies over max_bytes are not indented: pretty and colored are
+    then the body as-is. Raises ET.ParseError on malformed XML.
+    """
+    result = RenderedResponse()
+    indenters: List[XmlIndenter] = []
+    too_large = isinstance(source, (bytes, bytearray, str)) and _over_limit(source, max_bytes)
+    if too_large:
+        text = source if isinstance(source, str) else source.decode("utf-8", errors="replace")
+        result.pretty = text if pretty else None
+        result.colored = text if color else None
+    else:
+        # The record parser needs whole items and detaches them itself;
+        # otherwise the last indenter to see an element drops it.
+        detach = record_parser is None
+        if pretty:
+            indenters.append(XmlIndenter(indent, detach=detach and not color))
+        if color:
+            indenters.append(ColorXmlIndenter(indent, detach=detach))
+
+    parser = ET.XMLPullParser(XmlIndenter.EVENTS)
+
+    def drain() -> None:
+        for event, payload in parser.read_events():
+            for indenter in indenters:
+                indenter.feed(event, payload)
+            if record_parser is not None and event != "start-ns":
+                record = record_parser.feed(event, payload)
+                if record is not None:
+                    result.records.append(record)
+
+    for chunk in _iter_chunks(source):
+        parser.feed(chunk)
+        drain()
+    parser.close()
+    drain()
+
+    for indenter in indenters:
+        if isinstance(indenter, ColorXmlIndenter):
+            result.colored = indenter.take()
+        else:
+            result.pretty = indenter.take()
+    return result
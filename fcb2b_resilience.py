@@ -0,0 +1,505 @@
+"""
+Flow control for outbound fcB2B calls.
+
+Features:
+- RateLimiter: token buckets with an optional global budget and optional
+  per-service budgets (requests per second, with bursts).
+- AdaptiveConcurrency: AIMD limit on requests in flight. It backs off
+  multiplicatively on HTTP 429, 5xx, transport errors or latency well above
+  the recent best, and grows additively while responses are healthy.
+- RetryPolicy: retries on connect errors, timeouts and retryable status
+  codes with jittered exponential backoff, capped by a shared RetryBudget.
+  The client re-signs every attempt with a fresh GlobalIdentifier/TimeStamp.
+- CircuitBreaker: one per service URL (closed / open / half-open), so calls
+  to a failing endpoint fail fast instead of waiting out the timeout.
+- Deadline: an absolute time budget passed down through a call or a whole
+  batch; timeouts, waits and retries are clamped to what is left.
+
+All of them plug into FcB2BClient, so every call made through the client
+(single calls, batch runs) respects them.
+
+Usage:
+    from fcb2b_resilience import (
+        AdaptiveConcurrency, CircuitBreakerRegistry, RateLimiter, RetryPolicy,
+    )
+
+    client = FcB2BClient(
+        rate_limiter=RateLimiter(global_rate=50, service_rates={"RelatedItems": 10}),
+        concurrency=AdaptiveConcurrency(initial=4, max_limit=32),
+        retry_policy=RetryPolicy(attempts=4),
+        circuit_breakers=CircuitBreakerRegistry(failure_threshold=5, recovery_timeout=30),
+    )
+"""
+
+import random
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import requests
+
+# ====== CONFIGURATION ======
+
+DEFAULT_BURST = 1.0             # bucket capacity, as seconds' worth of rate
+
+AIMD_INITIAL = 4
+AIMD_MIN = 1
+AIMD_MAX = 64
+AIMD_INCREASE = 1.0             # limit growth per limit's worth of healthy responses
+AIMD_BACKOFF = 0.5              # multiplier applied on overload
+AIMD_LATENCY_TOLERANCE = 2.0    # smoothed latency above best * tolerance counts as overload
+AIMD_LATENCY_SMOOTHING = 0.2    # EWMA weight of the newest latency sample
+AIMD_BASELINE_DRIFT = 0.01      # per sample, how far best_latency moves up towards the smoothed latency
+AIMD_COOLDOWN = 1.0             # seconds between two successive backoffs
+
+RETRY_ATTEMPTS = 3              # total attempts, including the first
+RETRY_BASE_DELAY = 0.2          # seconds; backoff ceiling doubles per attempt
+RETRY_MAX_DELAY = 5.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_BUDGET_RATIO = 0.2        # retries earned per first attempt
+RETRY_BUDGET_MIN = 10.0         # retries always available (and the initial balance)
+
+BREAKER_FAILURE_THRESHOLD = 5   # consecutive failures that open the circuit
+BREAKER_RECOVERY_TIMEOUT = 30.0 # seconds open before a probe is let through
+BREAKER_HALF_OPEN_PROBES = 1    # concurrent probe calls allowed while half-open
+BREAKER_FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+
+# ====== RATE LIMITING ======
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most
+    `capacity` tokens (which bounds the burst size).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate * DEFAULT_BURST)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens if available and return 0; otherwise take nothing and
+        return the seconds to wait before they will be.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Block until tokens are available. Returns False if that would take
+        longer than timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Global and per-service request budgets. A call has to get a token from
+    its service's bucket (if one is configured) and from the global bucket.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        service_rates: Optional[Dict[str, float]] = None,
+        burst: float = DEFAULT_BURST,
+    ):
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate * burst)) if global_rate else None
+        self.service_buckets = {
+            name: TokenBucket(rate, max(1.0, rate * burst))
+            for name, rate in (service_rates or {}).items()
+        }
+
+    def acquire(self, service_name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for permission to call service_name. Returns False on timeout.
+        """
+        start = time.monotonic()
+        bucket = self.service_buckets.get(service_name)
+        if bucket is not None and not bucket.acquire(timeout=timeout):
+            return False
+        if self.global_bucket is not None:
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+            return self.global_bucket.acquire(timeout=remaining)
+        return True
+
+
+# ====== ADAPTIVE CONCURRENCY ======
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller for the number of requests in flight.
+
+    Every call does acquire() before sending and release(latency, status)
+    afterwards (status None for a transport error). Overload signals (429,
+    5xx, errors, or smoothed latency above best_latency * latency_tolerance)
+    cut the limit by `backoff`, at most once per cooldown. Healthy responses
+    add increase/limit, i.e. about `increase` per round of requests.
+
+    Latency is compared as an EWMA so that ordinary jitter does not look
+    like overload. best_latency follows drops of the smoothed value at once
+    and rises towards it by baseline_drift per sample, so one fast spell
+    (or a fast service sharing the controller) does not pin the limit at
+    min_limit for the rest of the run once latency settles higher.
+    """
+
+    def __init__(
+        self,
+        initial: int = AIMD_INITIAL,
+        min_limit: int = AIMD_MIN,
+        max_limit: int = AIMD_MAX,
+        increase: float = AIMD_INCREASE,
+        backoff: float = AIMD_BACKOFF,
+        latency_tolerance: float = AIMD_LATENCY_TOLERANCE,
+        latency_smoothing: float = AIMD_LATENCY_SMOOTHING,
+        baseline_drift: float = AIMD_BASELINE_DRIFT,
+        cooldown: float = AIMD_COOLDOWN,
+    ):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("need 1 <= min_limit <= initial <= max_limit")
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+        self.baseline_drift = baseline_drift
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.smoothed_latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self.backoffs = 0
+        self._last_backoff = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a slot under the current limit is free. Returns False
+        if none freed up within timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: float, status: Optional[int]) -> None:
+        """
+        Free the slot and adjust the limit from the call's outcome.
+        """
+        with self._cond:
+            self.in_flight -= 1
+
+            overload = status is None or status == 429 or status >= 500
+            if not overload:
+                self._observe_latency(latency)
+                overload = self.smoothed_latency > self.best_latency * self.latency_tolerance
+
+            if overload:
+                now = time.monotonic()
+                if now - self._last_backoff >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_backoff = now
+                    self.backoffs += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency += self.latency_smoothing * (latency - self.smoothed_latency)
+        if self.best_latency is None or self.smoothed_latency < self.best_latency:
+            self.best_latency = self.smoothed_latency
+        else:
+            self.best_latency += self.baseline_drift * (self.smoothed_latency - self.best_latency)
+
+
+# ====== DEADLINES ======
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a call or batch runs out of its time budget.
+    """
+
+
+class Deadline:
+    """
+    A fixed point in time, `seconds` from creation. Pass the same Deadline
+    down through nested calls so they all share one budget.
+    """
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def clamp(self, timeout: Tuple[float, float]) -> Tuple[float, float]:
+        """
+        Clamp a requests-style (connect, read) timeout to the time left.
+        """
+        # requests rejects a zero timeout, so never go below 1ms.
+        left = max(0.001, self.remaining())
+        return min(timeout[0], left), min(timeout[1], left)
+
+
+# ====== RETRIES ======
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of traffic, so a failing upstream is not hit
+    with attempts * traffic. Each first attempt deposits `ratio` tokens
+    (up to min_retries + ratio * 100), each retry spends one.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: float = RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.capacity = min_retries + ratio * 100
+        self._tokens = min_retries
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a call.
+
+    attempts       : total attempts including the first (1 disables retries)
+    base_delay     : backoff ceiling for the first retry; doubles each time,
+                     up to max_delay. The actual sleep is uniform in
+                     [0, ceiling] ("full jitter").
+    retry_statuses : HTTP statuses worth retrying
+    budget         : optional RetryBudget shared by every call using the policy
+    """
+
+    def __init__(
+        self,
+        attempts: int = RETRY_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        retry_statuses: FrozenSet[int] = RETRY_STATUSES,
+        budget: Optional[RetryBudget] = None,
+    ):
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget if budget is not None else RetryBudget()
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Note a new call (first attempt) against the budget.
+        """
+        self.budget.record_request()
+
+    def should_retry(self, attempt: int, status: Optional[int] = None,
+                     error: Optional[BaseException] = None, wait: float = 0.0,
+                     deadline: Optional[Deadline] = None) -> bool:
+        """
+        Decide whether attempt number `attempt` (0-based) should be retried,
+        given its status or the error it raised, after sleeping `wait`
+        seconds. A retry whose back-off would run past the deadline is
+        refused before any budget is spent; budget is spent only on yes.
+        """
+        if attempt + 1 >= self.attempts:
+            return False
+        if error is not None:
+            retryable = isinstance(error, (requests.ConnectionError, requests.Timeout))
+        else:
+            retryable = status in self.retry_statuses
+        if not retryable:
+            return False
+        if deadline is not None and wait >= deadline.remaining():
+            return False
+        if not self.budget.try_spend():
+            return False
+        with self._lock:
+            self.retries += 1
+        return True
+
+    def delay(self, attempt: int, resp: Optional[requests.Response] = None) -> float:
+        """
+        Seconds to sleep before the retry after attempt `attempt`. A numeric
+        Retry-After header is honored (still capped at max_delay).
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        wait = random.uniform(0, ceiling)
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            wait = max(wait, min(self.max_delay, float(retry_after)))
+        return wait
+
+
+# ====== CIRCUIT BREAKER ======
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an endpoint whose circuit is open.
+    """
+
+    def __init__(self, url: str, retry_in: float):
+        super().__init__(f"Circuit open for {url}; next probe in {retry_in:.1f}s")
+        self.url = url
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one endpoint.
+
+    closed    : calls go through; failure_threshold consecutive failures
+                (transport errors or failure_statuses) open the circuit
+    open      : calls fail immediately with CircuitOpenError until
+                recovery_timeout has passed
+    half-open : up to half_open_probes calls are let through as probes; a
+                success closes the circuit, a failure opens it again
+
+    before_call() returns a ticket to pass to record() / cancel(). Outcomes
+    of calls admitted before the last state change are ignored: a slow call
+    sent while the circuit was closed cannot close it again once it has
+    opened, nor settle a half-open circuit in place of the probe.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        url: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+        failure_statuses: FrozenSet[int] = BREAKER_FAILURE_STATUSES,
+    ):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self.failure_statuses = frozenset(failure_statuses)
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._generation = 0   # bumped on every state change
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+
+    def before_call(self) -> int:
+        """
+        Raise CircuitOpenError if the call must not go through; otherwise
+        return the call's ticket.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                wait = self._opened_at + self.recovery_timeout - time.monotonic()
+                if wait > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.url, wait)
+                self._set_state(self.HALF_OPEN)
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.url, 0.0)
+                self._probes += 1
+            return self._generation
+
+    def cancel(self, ticket: int) -> None:
+        """
+        Give back a probe slot taken by before_call() for a call that was
+        never sent.
+        """
+        with self._lock:
+            if ticket == self._generation and self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, ticket: int, status: Optional[int]) -> None:
+        """
+        Report a call's outcome (status None for a transport error).
+        """
+        failed = status is None or status in self.failure_statuses
+        with self._lock:
+            if ticket != self._generation:
+                return  # admitted before the circuit last changed state
+            if not failed:
+                if self.state != self.CLOSED:
+                    self._set_state(self.CLOSED)
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._set_state(self.OPEN)
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """
+    Hands out one CircuitBreaker per endpoint URL, all with the same settings.
+    """
+
+    def __init__(self, **breaker_settings):
+        self.breaker_settings = breaker_settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(url)
+            if breaker is None:
+                breaker = self._breakers[url] = CircuitBreaker(url, **self.breaker_settings)
+            return breaker
+
+    def breakers(self) -> List[CircuitBreaker]:
+        with self._lock:
+            return list(self._breakers.values())
@@ -0,0 +1,359 @@
+"""
+Output sinks for parsed fcB2B records (StockCheck, InventoryInquiry,
+RelatedItems), for feeding batch results into a warehouse.
+
+Features:
+- JsonLinesSink, CsvSink and ParquetSink write one row per record.
+- Rows are buffered and written batch_size at a time, so a run of any
+  length only ever holds one batch per sink in memory.
+- ThreadedSink moves the writing (encoding, compression, disk I/O) to a
+  background thread with a bounded queue, so a slow sink does not stall
+  the requests; if it falls far behind, producers wait instead of
+  queueing without limit.
+- JSON Lines and CSV files can be appended to (append=True), e.g. when a
+  checkpointed batch resumes; CSV then keeps the existing header.
+
+ParquetSink needs pyarrow (pip install pyarrow); the other sinks only use
+the standard library.
+
+Usage:
+    from fcb2b_sinks import open_sink
+
+    with open_sink("csv", "stock.csv") as sink:
+        async for result in stream_batch(skus, service):
+            if result.ok:
+                sink.write_many(result.result)
+"""
+
+import csv
+import json
+import queue
+import sys
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple, Union
+
+# ====== CONFIGURATION ======
+
+SINK_BATCH_SIZE = 1000          # rows per write for JSON Lines / CSV
+PARQUET_BATCH_SIZE = 50000      # rows per Parquet row group
+SINK_QUEUE_BATCHES = 8          # batches ThreadedSink buffers before producers wait
+PARQUET_DECIMAL_TYPE = (18, 6)  # (precision, scale) for Decimal quantities
+PARQUET_COMPRESSION = "zstd"
+
+FORMATS = ("jsonl", "csv", "parquet")
+
+Row = Dict[str, Any]
+
+# ====== SINKS ======
+
+def as_row(record: Any) -> Row:
+    """
+    A record (fcb2b_parsers.Record) or a plain dict as a row dict.
+    """
+    return record if isinstance(record, dict) else record.as_dict()
+
+
+def _open_text(target: Union[str, TextIO, None], append: bool = False) -> Tuple[TextIO, bool]:
+    """
+    (file, owned): '-' or None is stdout, a str is a path opened for
+    writing (or appending).
+    """
+    if target is None or target == "-":
+        return sys.stdout, False
+    if isinstance(target, str):
+        return open(target, "a" if append else "w", encoding="utf-8", newline=""), True
+    return target, False
+
+
+def _csv_header(path: str) -> Optional[List[str]]:
+    try:
+        with open(path, encoding="utf-8", newline="") as fh:
+            return next(csv.reader(fh), None)
+    except FileNotFoundError:
+        return None
+
+
+class RecordSink:
+    """
+    Base class: buffers rows and hands them to _write_batch() batch_size at
+    a time. Subclasses implement _write_batch() and, if they hold a file,
+    _close().
+    """
+
+    def __init__(self, batch_size: int = SINK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._buffer: List[Row] = []
+        self._closed = False
+
+    def write(self, record: Any) -> None:
+        self._buffer.append(as_row(record))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[Any]) -> None:
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        if self._buffer:
+            rows, self._buffer = self._buffer, []
+            self._write_batch(rows)
+            self.rows_written += len(rows)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.flush()
+        finally:
+            self._close()
+
+    def _write_batch(self, rows: List[Row]) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonLinesSink(RecordSink):
+    """
+    One compact JSON object per line. Decimals are written as strings so
+    quantities keep their exact value.
+    """
+
+    def __init__(
+        self,
+        target: Union[str, TextIO, None] = None,
+        batch_size: int = SINK_BATCH_SIZE,
+        append: bool = False,
+    ):
+        super().__init__(batch_size)
+        self._fh, self._owned = _open_text(target, append)
+        self._encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+
+    def _write_batch(self, rows: List[Row]) -> None:
+        encode = self._encoder.encode
+        self._fh.write("".join(encode(row) + "\n" for row in rows))
+        self._fh.flush()
+
+    def _close(self) -> None:
+        if self._owned:
+            self._fh.close()
+
+
+class CsvSink(RecordSink):
+    """
+    CSV with a header row. fields fixes the columns; by default they are
+    the keys of the first row. Keys not in fields are dropped. When
+    appending to a non-empty file, its header sets the columns and is not
+    written again.
+    """
+
+    def __init__(
+        self,
+        target: Union[str, TextIO, None] = None,
+        fields: Optional[List[str]] = None,
+        batch_size: int = SINK_BATCH_SIZE,
+        append: bool = False,
+    ):
+        super().__init__(batch_size)
+        header = _csv_header(target) if append and isinstance(target, str) and target != "-" else None
+        self.fields = header or fields
+        self._fh, self._owned = _open_text(target, append)
+        self._writer: Optional[csv.DictWriter] = None
+        self._header_written = header is not None
+
+    def _write_batch(self, rows: List[Row]) -> None:
+        if self._writer is None:
+            self.fields = self.fields or list(rows[0])
+            self._writer = csv.DictWriter(self._fh, self.fields, extrasaction="ignore")
+            if not self._header_written:
+                self._writer.writeheader()
+        self._writer.writerows(rows)
+        self._fh.flush()
+
+    def _close(self) -> None:
+        if self._owned:
+            self._fh.close()
+
+
+class ParquetSink(RecordSink):
+    """
+    Parquet file, one row group per batch. The schema is taken from the
+    first batch: Decimal -> decimal128, bool -> bool, int -> int64,
+    float -> float64, anything else -> string.
+    """
+
+    def __init__(self, path: str, batch_size: int = PARQUET_BATCH_SIZE,
+                 compression: str = PARQUET_COMPRESSION):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from e
+        super().__init__(batch_size)
+        self.path = path
+        self.compression = compression
+        self._pa = pa
+        self._pq = pq
+        self._schema = None
+        self._writer = None
+
+    def _infer_schema(self, rows: List[Row]):
+        pa = self._pa
+        fields = []
+        for name in rows[0]:
+            sample = next((row[name] for row in rows if row.get(name) is not None), None)
+            if isinstance(sample, bool):
+                typ = pa.bool_()
+            elif isinstance(sample, Decimal):
+                typ = pa.decimal128(*PARQUET_DECIMAL_TYPE)
+            elif isinstance(sample, int):
+                typ = pa.int64()
+            elif isinstance(sample, float):
+                typ = pa.float64()
+            else:
+                typ = pa.string()
+            fields.append(pa.field(name, typ))
+        return pa.schema(fields)
+
+    def _write_batch(self, rows: List[Row]) -> None:
+        if self._writer is None:
+            self._schema = self._infer_schema(rows)
+            self._writer = self._pq.ParquetWriter(self.path, self._schema, compression=self.compression)
+        columns = {}
+        for f in self._schema:
+            values = [row.get(f.name) for row in rows]
+            if self._pa.types.is_string(f.type):
+                values = [None if v is None else str(v) for v in values]
+            columns[f.name] = values
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+_STOP = object()
+
+
+class ThreadedSink:
+    """
+    Runs another sink on a background thread.
+
+    write()/write_many() only buffer rows and, every batch_size rows, put
+    the batch on a queue of at most max_batches; the thread writes batches
+    in order. An error on the writer thread is raised on the next write(),
+    flush() or close(). flush() waits until everything written so far has
+    reached the underlying sink.
+    """
+
+    def __init__(self, sink: RecordSink, max_batches: int = SINK_QUEUE_BATCHES):
+        self.sink = sink
+        self.batch_size = sink.batch_size
+        self._buffer: List[Row] = []
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_batches)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="fcb2b-sink", daemon=True)
+        self._thread.start()
+
+    @property
+    def rows_written(self) -> int:
+        return self.sink.rows_written
+
+    def write(self, record: Any) -> None:
+        self._buffer.append(as_row(record))
+        if len(self._buffer) >= self.batch_size:
+            self._hand_off()
+
+    def write_many(self, records: Iterable[Any]) -> None:
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._hand_off()
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._buffer and self._error is None:
+            self._hand_off()
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_error()
+
+    def _hand_off(self) -> None:
+        self._raise_error()
+        rows, self._buffer = self._buffer, []
+        self._queue.put(rows)
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        while True:
+            rows = self._queue.get()
+            if rows is _STOP:
+                self._queue.task_done()
+                break
+            try:
+                if self._error is None:  # otherwise keep draining so producers never block forever
+                    self.sink.write_many(rows)
+                    self.sink.flush()
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+        try:
+            self.sink.close()
+        except BaseException as e:
+            self._error = self._error or e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_sink(
+    fmt: str,
+    target: Optional[str] = None,
+    threaded: bool = True,
+    append: bool = False,
+    **kwargs,
+) -> Union[RecordSink, ThreadedSink]:
+    """
+    Create a sink by format name ("jsonl", "csv" or "parquet"). target is a
+    path, or '-' / None for stdout (not for parquet). append=True adds to
+    an existing file (jsonl and csv only). With threaded=True the sink is
+    wrapped in a ThreadedSink. kwargs go to the sink class.
+    """
+    if fmt == "jsonl":
+        sink: RecordSink = JsonLinesSink(target, append=append, **kwargs)
+    elif fmt == "csv":
+        sink = CsvSink(target, append=append, **kwargs)
+    elif fmt == "parquet":
+        if target is None or target == "-":
+            raise ValueError("Parquet output needs a file path")
+        if append:
+            raise ValueError("Parquet files cannot be appended to")
+        sink = ParquetSink(target, **kwargs)
+    else:
+        raise ValueError(f"Unknown output format: {fmt} (expected one of {', '.join(FORMATS)})")
+    return ThreadedSink(sink) if threaded else sink
@@ -0,0 +1,440 @@
+"""
+Local SQLite store of InventoryInquiry snapshots.
+
+Features:
+- Keeps the parsed AvailableItem rows of the latest InventoryInquiry
+  response per SKU, together with when it was fetched.
+- Indexed on SKU, FOB point and dye lot, so questions like "which FOB
+  points hold dye lot X" are answered locally in milliseconds.
+- get_or_fetch() only calls the remote service when the stored snapshot is
+  missing or older than max_age.
+- Each snapshot carries a hash of its normalized lots. put() compares it
+  with the stored one and returns only the changes (lots added or removed,
+  quantity changes per FOB point), and skips rewriting unchanged SKUs.
+  put_many(commit=False) stages instead of writing, so callers can save
+  the changes before the new snapshots are committed.
+- Safe to share between the worker threads of a batch run (one connection,
+  serialized by a lock; WAL journal so readers in other processes are not
+  blocked).
+
+Usage:
+    from fcb2b_store import InventoryStore
+
+    with InventoryStore() as store:
+        items = store.get_or_fetch(service, "CASIMP10", client)
+        for item in store.find(dye_lot="102924IM10"):
+            print(item.sku, item.fob_point, item.quantity)
+
+        for change in store.put("CASIMP10", new_items):
+            print(change.kind, change.fob_point, change.dye_lot, change.new_quantity)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fcb2b_client import FcB2BClient, ServiceProfile, get_default_client, make_request_params
+from fcb2b_parsers import AvailableItem, parse_records
+
+# ====== CONFIGURATION ======
+
+STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fcb2b", "inventory.sqlite3")
+STORE_MAX_AGE = 900.0   # seconds a snapshot is served without calling the service
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    sku           TEXT PRIMARY KEY,
+    fetched_at    REAL NOT NULL,
+    content_hash  TEXT               -- snapshot_hash() of the items
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_fetched_at ON snapshots (fetched_at);
+
+CREATE TABLE IF NOT EXISTS available_items (
+    sku          TEXT NOT NULL,      -- the requested SKU (snapshots.sku)
+    description  TEXT,
+    fob_point    TEXT,
+    dye_lot      TEXT,
+    roll_or_cut  INTEGER,
+    uom          TEXT,
+    quantity     TEXT                -- Decimal as text, to keep it exact
+);
+CREATE INDEX IF NOT EXISTS idx_items_sku ON available_items (sku);
+CREATE INDEX IF NOT EXISTS idx_items_fob_point ON available_items (fob_point);
+CREATE INDEX IF NOT EXISTS idx_items_dye_lot ON available_items (dye_lot);
+"""
+
+ITEM_COLUMNS = ("sku", "description", "fob_point", "dye_lot", "roll_or_cut", "uom", "quantity")
+
+# ====== DATA CLASSES ======
+
+@dataclass
+class Snapshot:
+    sku: str
+    fetched_at: float               # wall-clock time of the fetch
+    items: List[AvailableItem]
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.fetched_at
+
+
+@dataclass
+class InventoryChange:
+    sku: str
+    kind: str                        # "added", "removed" or "changed"
+    fob_point: Optional[str]
+    dye_lot: Optional[str]
+    roll_or_cut: Optional[bool]
+    uom: Optional[str]
+    old_quantity: Optional[Decimal]  # None when added
+    new_quantity: Optional[Decimal]  # None when removed
+
+    def as_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+# ====== CHANGE DETECTION ======
+
+# One lot at one FOB point. Rows sharing a key (e.g. several rolls of the
+# same dye lot) are summed.
+LotKey = Tuple[Optional[str], Optional[str], Optional[bool], Optional[str]]
+
+
+def normalize_items(items: Iterable[AvailableItem]) -> Dict[LotKey, Optional[Decimal]]:
+    """
+    Total quantity per (fob_point, dye_lot, roll_or_cut, uom).
+    """
+    lots: Dict[LotKey, Optional[Decimal]] = {}
+    for item in items:
+        key = (item.fob_point, item.dye_lot, item.roll_or_cut, item.uom)
+        if item.quantity is None:
+            lots.setdefault(key, None)
+        else:
+            lots[key] = (lots.get(key) or Decimal(0)) + item.quantity
+    return lots
+
+
+def _sort_key(key: LotKey) -> Tuple:
+    return tuple("" if v is None else str(v) for v in key)
+
+
+def snapshot_hash(lots: Dict[LotKey, Optional[Decimal]]) -> str:
+    """
+    Stable hash of normalized lots: row order, how a lot is split into rows
+    and trailing zeros ("10.50" vs "10.5") do not change it.
+    """
+    h = hashlib.sha256()
+    for key in sorted(lots, key=_sort_key):
+        qty = lots[key]
+        fields = _sort_key(key) + ("" if qty is None else str(qty.normalize()),)
+        h.update("\x1f".join(fields).encode("utf-8") + b"\x1e")
+    return h.hexdigest()
+
+
+def diff_lots(
+    sku: str,
+    old: Dict[LotKey, Optional[Decimal]],
+    new: Dict[LotKey, Optional[Decimal]],
+) -> List[InventoryChange]:
+    """
+    Changes that turn old into new, ordered by lot.
+    """
+    changes = []
+    for key in sorted(old.keys() | new.keys(), key=_sort_key):
+        if key not in new:
+            kind = "removed"
+        elif key not in old:
+            kind = "added"
+        elif old[key] != new[key]:
+            kind = "changed"
+        else:
+            continue
+        changes.append(InventoryChange(sku, kind, *key, old.get(key), new.get(key)))
+    return changes
+
+
+# ====== STORE ======
+
+def _to_row(sku: str, item: AvailableItem) -> Tuple:
+    return (
+        sku,
+        item.description,
+        item.fob_point,
+        item.dye_lot,
+        None if item.roll_or_cut is None else int(item.roll_or_cut),
+        item.uom,
+        None if item.quantity is None else str(item.quantity),
+    )
+
+
+def _from_row(row: Sequence) -> AvailableItem:
+    sku, description, fob_point, dye_lot, roll_or_cut, uom, quantity = row
+    return AvailableItem(
+        sku=sku,
+        description=description,
+        fob_point=fob_point,
+        dye_lot=dye_lot,
+        roll_or_cut=None if roll_or_cut is None else bool(roll_or_cut),
+        uom=uom,
+        quantity=None if quantity is None else Decimal(quantity),
+    )
+
+
+class InventoryStore:
+    """
+    SQLite-backed InventoryInquiry snapshots, one per SKU.
+
+    put() replaces a SKU's snapshot atomically; queries only ever see whole
+    snapshots. max_age is the default staleness limit for is_fresh() and
+    get_or_fetch(). path=":memory:" keeps everything in memory.
+    """
+
+    def __init__(self, path: str = STORE_PATH, max_age: float = STORE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        # sku -> (fetched_at, content_hash, items, rewrite rows?) awaiting commit()
+        self._staged: Dict[str, Tuple[float, Optional[str], List[AvailableItem], bool]] = {}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            columns = {r[1] for r in self._conn.execute("PRAGMA table_info(snapshots)")}
+            if "content_hash" not in columns:
+                # Store created before change detection: the first put()
+                # per SKU diffs against the stored rows and sets the hash.
+                self._conn.execute("ALTER TABLE snapshots ADD COLUMN content_hash TEXT")
+
+    # --- writing ---
+
+    def put(
+        self,
+        sku: str,
+        items: Iterable[AvailableItem],
+        fetched_at: Optional[float] = None,
+    ) -> List[InventoryChange]:
+        """
+        Store items as the current snapshot for sku (an empty list records
+        that the SKU had no availability) and return what changed since
+        the previous snapshot. For a SKU seen for the first time every lot
+        is "added".
+        """
+        return self.put_many([(sku, items)], fetched_at)
+
+    def put_many(
+        self,
+        snapshots: Iterable[Tuple[str, Iterable[AvailableItem]]],
+        fetched_at: Optional[float] = None,
+        commit: bool = True,
+    ) -> List[InventoryChange]:
+        """
+        Store several (sku, items) snapshots and return their changes. A SKU
+        whose hash matches the stored one only has its fetched_at refreshed.
+
+        With commit=False the snapshots are only staged: the changes are
+        returned, but nothing is written until commit(). A caller that
+        must not lose changes writes them out first and commits after, so
+        a crash in between re-reports them instead of dropping them.
+        Staged snapshots count as the previous ones for later calls, but
+        queries only see committed data.
+        """
+        fetched_at = fetched_at or time.time()
+        changes: List[InventoryChange] = []
+        with self._lock:
+            for sku, items in snapshots:
+                items = list(items)
+                lots = normalize_items(items)
+                digest = snapshot_hash(lots)
+                staged = self._staged.get(sku)
+                if staged is not None:
+                    stored, old_digest, rewrite = True, staged[1], staged[3]
+                else:
+                    row = self._conn.execute("SELECT content_hash FROM snapshots WHERE sku = ?", (sku,)).fetchone()
+                    stored, old_digest, rewrite = row is not None, row and row[0], False
+                if stored and old_digest == digest:
+                    self._staged[sku] = (fetched_at, digest, items, rewrite)
+                    continue
+
+                if staged is not None:
+                    old = normalize_items(staged[2])
+                else:
+                    old = normalize_items(self._items(self._conn, sku)) if stored else {}
+                changes += diff_lots(sku, old, lots)
+                self._staged[sku] = (fetched_at, digest, items, True)
+        if commit:
+            self.commit()
+        return changes
+
+    @property
+    def pending(self) -> int:
+        """
+        Snapshots staged by put_many(commit=False) and not yet committed.
+        """
+        return len(self._staged)
+
+    def commit(self) -> None:
+        """
+        Write the staged snapshots in one transaction.
+        """
+        with self._lock:
+            if not self._staged:
+                return
+            staged, self._staged = self._staged, {}
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                for sku, (fetched_at, digest, items, rewrite) in staged.items():
+                    if not rewrite:
+                        cur.execute("UPDATE snapshots SET fetched_at = ? WHERE sku = ?", (fetched_at, sku))
+                        continue
+                    cur.execute("DELETE FROM available_items WHERE sku = ?", (sku,))
+                    cur.executemany(
+                        f"INSERT INTO available_items ({', '.join(ITEM_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(ITEM_COLUMNS))})",
+                        [_to_row(sku, item) for item in items],
+                    )
+                    cur.execute(
+                        "INSERT INTO snapshots (sku, fetched_at, content_hash) VALUES (?, ?, ?) "
+                        "ON CONFLICT (sku) DO UPDATE SET fetched_at = excluded.fetched_at, "
+                        "content_hash = excluded.content_hash",
+                        (sku, fetched_at, digest),
+                    )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                # Keep them staged (newer stagings win) so a later commit can retry.
+                self._staged = {**staged, **self._staged}
+                raise
+
+    def delete(self, sku: str) -> None:
+        with self._lock:
+            self._staged.pop(sku, None)
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            cur.execute("DELETE FROM available_items WHERE sku = ?", (sku,))
+            cur.execute("DELETE FROM snapshots WHERE sku = ?", (sku,))
+            cur.execute("COMMIT")
+
+    # --- reading ---
+
+    def snapshot(self, sku: str) -> Optional[Snapshot]:
+        """
+        The stored snapshot for sku, or None if it was never fetched.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at FROM snapshots WHERE sku = ?", (sku,)).fetchone()
+            if row is None:
+                return None
+            items = self._items(self._conn, sku)
+        return Snapshot(sku, row[0], items)
+
+    def _items(self, conn, sku: str) -> List[AvailableItem]:
+        rows = conn.execute(
+            f"SELECT {', '.join(ITEM_COLUMNS)} FROM available_items WHERE sku = ? ORDER BY rowid",
+            (sku,),
+        ).fetchall()
+        return [_from_row(r) for r in rows]
+
+    def fetched_at(self, sku: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at FROM snapshots WHERE sku = ?", (sku,)).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, sku: str, max_age: Optional[float] = None) -> bool:
+        fetched_at = self.fetched_at(sku)
+        limit = self.max_age if max_age is None else max_age
+        return fetched_at is not None and time.time() - fetched_at < limit
+
+    def stale_skus(self, skus: Iterable[str], max_age: Optional[float] = None) -> List[str]:
+        """
+        The SKUs (in input order) with no snapshot or one older than max_age.
+        """
+        return [sku for sku in skus if not self.is_fresh(sku, max_age)]
+
+    def find(
+        self,
+        sku: Optional[str] = None,
+        fob_point: Optional[str] = None,
+        dye_lot: Optional[str] = None,
+    ) -> List[AvailableItem]:
+        """
+        Stored items matching every given filter (all items if none).
+        """
+        where, args = [], []
+        for column, value in (("sku", sku), ("fob_point", fob_point), ("dye_lot", dye_lot)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        sql = f"SELECT {', '.join(ITEM_COLUMNS)} FROM available_items"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY sku, rowid", args).fetchall()
+        return [_from_row(r) for r in rows]
+
+    def fob_points_for_dye_lot(self, dye_lot: str, sku: Optional[str] = None) -> List[str]:
+        """
+        Distinct FOB points holding the dye lot (optionally for one SKU).
+        """
+        sql = "SELECT DISTINCT fob_point FROM available_items WHERE dye_lot = ?"
+        args: List[str] = [dye_lot]
+        if sku is not None:
+            sql += " AND sku = ?"
+            args.append(sku)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY fob_point", args).fetchall()
+        return [r[0] for r in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    # --- fetching ---
+
+    def get_or_fetch(
+        self,
+        service: ServiceProfile,
+        sku: str,
+        client: Optional[FcB2BClient] = None,
+        max_age: Optional[float] = None,
+    ) -> List[AvailableItem]:
+        """
+        The stored items for sku if its snapshot is fresh, otherwise call
+        InventoryInquiry, store the result and return it. Raises
+        requests.HTTPError if the call does not return 200.
+        """
+        if service.name != "InventoryInquiry":
+            raise ValueError(f"InventoryStore holds InventoryInquiry results, not {service.name}")
+        snap = self.snapshot(sku)
+        limit = self.max_age if max_age is None else max_age
+        if snap is not None and snap.age() < limit:
+            return snap.items
+
+        client = client or get_default_client()
+        resp = client.request(service, make_request_params(sku))
+        resp.raise_for_status()
+        items = parse_records(service.name, resp.content)
+        self.put(sku, items)
+        return items
+
+    def close(self, commit: bool = True) -> None:
+        """
+        Close the store, committing staged snapshots unless commit=False.
+        """
+        if commit:
+            self.commit()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
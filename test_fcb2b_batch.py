@@ -0,0 +1,50 @@
+"""
+Tests for fcb2b_batch against an in-process fcb2b_mock_server.
+
+Run with: python -m pytest -q
+"""
+
+import asyncio
+import os
+
+from fcb2b_batch import ParsePool, stream_batch
+from fcb2b_client import FcB2BClient, fetch_service_profiles, find_service
+from fcb2b_mock_server import start_mock_server
+
+DOOMED_SKU = "KILLME"
+
+
+def _parse_or_die(body: bytes) -> int:
+    # Module level so the spawned workers can unpickle it.
+    if f"<SupplierItemSKU>{DOOMED_SKU}</SupplierItemSKU>".encode() in body:
+        os._exit(1)  # as abrupt as the OOM killer
+    return len(body)
+
+
+def test_parse_worker_death_fails_its_chunk_not_the_batch():
+    server = start_mock_server()
+    try:
+        with FcB2BClient(services_url=server.services_url) as client:
+            service = find_service(fetch_service_profiles(client), "StockCheck")
+            skus = [f"SKU{i:02d}" for i in range(40)]
+            skus.insert(10, DOOMED_SKU)
+
+            async def run(pool):
+                return [r async for r in stream_batch(skus, service, client, concurrency=4,
+                                                      parse=_parse_or_die, parse_pool=pool)]
+
+            with ParsePool(workers=2, chunk_size=2, max_chunks_in_flight=2) as pool:
+                results = asyncio.run(run(pool))
+                restarts = pool.restarts
+    finally:
+        server.shutdown()
+
+    by_sku = {r.sku: r for r in results}
+    assert sorted(by_sku) == sorted(skus)
+    assert not by_sku[DOOMED_SKU].ok
+    assert by_sku[DOOMED_SKU].error.startswith("Parse failed")
+    assert restarts >= 1
+    # Only chunks that were in the pool when the worker died may fail.
+    failed = [r for r in results if not r.ok]
+    assert len(failed) <= 2 * 2 * 2
+    assert all(r.result > 0 for r in results if r.ok)
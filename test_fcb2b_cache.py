@@ -0,0 +1,23 @@
+"""
+Tests for fcb2b_cache.
+
+Run with: python -m pytest -q
+"""
+
+import requests
+
+from fcb2b_cache import ResponseCache
+
+
+def test_uncached_services_do_not_count_as_misses():
+    cache = ResponseCache(ttls={"StockCheck": 30})
+    params = {"SupplierItemSKU": "A1", "GlobalIdentifier": "g1"}
+    resp = requests.Response()
+
+    assert cache.get("RelatedItems", params) is None
+    assert cache.get("StockCheck", params) is None
+    cache.put("StockCheck", params, resp)
+    assert cache.get("StockCheck", {**params, "GlobalIdentifier": "g2"}) is resp
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
@@ -0,0 +1,49 @@
+"""
+Tests for fcb2b_resilience.
+
+Run with: python -m pytest -q
+"""
+
+import pytest
+
+from fcb2b_resilience import CircuitBreaker, CircuitOpenError, Deadline, RetryBudget, RetryPolicy
+
+
+def test_straggler_success_does_not_close_open_circuit():
+    breaker = CircuitBreaker("https://example.test/svc", failure_threshold=2, recovery_timeout=60)
+    straggler = breaker.before_call()        # sent while closed, answers late
+    for _ in range(2):
+        breaker.record(breaker.before_call(), 503)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    breaker.record(straggler, 200)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_only_the_probe_settles_a_half_open_circuit():
+    breaker = CircuitBreaker("https://example.test/svc", failure_threshold=1, recovery_timeout=0)
+    straggler = breaker.before_call()
+    breaker.record(breaker.before_call(), None)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    probe = breaker.before_call()             # recovery_timeout passed: half-open
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(straggler, 200)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(probe, 200)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_past_the_deadline_spends_no_budget():
+    budget = RetryBudget(min_retries=1)
+    policy = RetryPolicy(attempts=3, budget=budget)
+    deadline = Deadline(0.5)
+
+    assert not policy.should_retry(0, status=503, wait=1.0, deadline=deadline)
+    assert policy.retries == 0
+    assert policy.should_retry(0, status=503, wait=0.0, deadline=deadline)  # the token is still there
+    assert policy.retries == 1
+    assert not budget.try_spend()